@@ -25,8 +25,7 @@ def demo_nlp_engine():
         "这个圆柱面的直径是多少？"
     ]
 
-    for query in test_queries:
-        result = parser.parse_query(query)
+    for query, result in zip(test_queries, parser.parse_batch(test_queries)):
         print(f"\n查询: {query}")
         print(f"意图: {result['intent']}")
         print(f"查询类型: {result['query_type']}")
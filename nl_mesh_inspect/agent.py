@@ -4,7 +4,7 @@
 注意：此文件现在使用基于大模型的LangGraph智能体架构
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 from nl_mesh_inspect.models import AnalysisRequest, AnalysisResult, ModelInfo
 from nl_mesh_inspect.llm_agent import LLMNLMeshAgent
@@ -26,15 +26,26 @@ class NLMeshInspectAgent:
         """处理模型上传"""
         return self.langgraph_agent.process_upload(file_content, filename, file_format)
 
+    def process_upload_path(self, file_path: str, filename: str, file_format: str) -> Dict[str, Any]:
+        """处理已写入磁盘的模型文件"""
+        return self.langgraph_agent.process_upload_path(file_path, filename, file_format)
+
     def analyze_model(self, request: AnalysisRequest) -> AnalysisResult:
         """分析模型"""
         return self.langgraph_agent.analyze_model(request)
 
+    def analyze_model_batch(self, requests: List[AnalysisRequest]) -> List[AnalysisResult]:
+        """批量分析模型"""
+        return self.langgraph_agent.analyze_model_batch(requests)
 
     def get_model_info(self, model_id: str) -> Optional[ModelInfo]:
         """获取模型信息"""
         return self.langgraph_agent.get_model_info(model_id)
 
+    def get_model_file_path(self, model_id: str) -> Optional[str]:
+        """获取模型文件在磁盘上的路径"""
+        return self.langgraph_agent.get_model_file_path(model_id)
+
     def cleanup_model(self, model_id: str) -> bool:
         """清理模型数据"""
         return self.langgraph_agent.cleanup_model(model_id)
@@ -2,18 +2,28 @@
 FastAPI主应用 - 提供RESTful API接口
 """
 
+import asyncio
 import os
+import shutil
 import uuid
+from pathlib import Path
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from typing import List, Optional
+from typing import Optional, Set
+
+try:
+    import orjson
+except ImportError:
+    # orjson为可选依赖，未安装时使用Pydantic自带的JSON序列化
+    orjson = None
 
 from nl_mesh_inspect.agent import NLMeshInspectAgent
 from nl_mesh_inspect.models import (
     AnalysisRequest, AnalysisResult, ModelInfo, ModelFormat,
-    ErrorResponse, RealTimeUpdate
+    RealTimeUpdate
 )
 
 # 创建应用实例
@@ -34,35 +44,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传目录与流式写入的块大小
+UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # 创建智能体实例
-agent = NLMeshInspectAgent(upload_dir="uploads")
+agent = NLMeshInspectAgent(upload_dir=UPLOAD_DIR)
 
 # WebSocket连接管理器
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                # 移除失效的连接
-                self.active_connections.remove(connection)
+    async def broadcast(self, update: RealTimeUpdate):
+        # 没有订阅者时跳过序列化
+        if not self.active_connections:
+            return
+
+        message = _serialize_update(update)
+        # Reason: 对快照并发发送，总耗时取决于最慢的连接而不是所有连接之和
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_text(message) for connection in connections),
+            return_exceptions=True
+        )
+        # 一次性移除失效的连接（包括发送被取消的连接，CancelledError不是Exception子类）
+        self.active_connections.difference_update(
+            connection for connection, result in zip(connections, results)
+            if isinstance(result, BaseException)
+        )
 
 manager = ConnectionManager()
 
 
+# 错误响应模板，与ErrorResponse字段一致，处理器中复制并填充以避免构造Pydantic模型
+_ERROR_TEMPLATE = {"error": None, "details": None, "state_id": None}
+
+
+def _serialize_update(update: RealTimeUpdate) -> str:
+    """序列化实时更新消息，优先使用orjson"""
+    if orjson is not None:
+        try:
+            # Reason: 字段均为JSON原生类型或datetime，直接序列化__dict__可跳过model_dump的逐字段遍历
+            return orjson.dumps(update.__dict__).decode()
+        except TypeError:
+            # orjson无法处理的数据（如非字符串键、嵌套模型）回退到Pydantic
+            pass
+    return update.model_dump_json()
+
+
+def _save_upload_stream(source, destination: Path) -> None:
+    """将上传文件按块写入磁盘，内存占用与文件大小无关"""
+    with open(destination, "wb") as f:
+        shutil.copyfileobj(source, f, length=UPLOAD_CHUNK_SIZE)
+
+
 @app.get("/")
 async def root():
     """根端点 - 返回API信息"""
@@ -89,26 +135,37 @@ async def upload_model(
         # FastAPI 已自动验证和转换格式，直接使用
         model_format = file_format
 
-        # 读取文件内容
-        file_content = await file.read()
+        # 客户端可能不提供文件名，此时使用默认文件名
+        filename = Path(file.filename or "").name or f"model.{model_format.value}"
+        file_path = Path(UPLOAD_DIR) / f"{uuid.uuid4()}_{filename}"
 
-        # 处理上传
-        result = agent.process_upload(
-            file_content=file_content,
-            filename=file.filename,
-            file_format=model_format.value
-        )
+        try:
+            # 流式写入磁盘，避免整个文件驻留内存
+            await run_in_threadpool(_save_upload_stream, file.file, file_path)
+
+            # 处理上传（在线程池中执行，避免阻塞事件循环）
+            result = await run_in_threadpool(
+                agent.process_upload_path,
+                file_path=str(file_path),
+                filename=filename,
+                file_format=model_format.value
+            )
+        except Exception:
+            # 写入中断或处理失败时清理不完整的文件
+            file_path.unlink(missing_ok=True)
+            raise
 
         if not result["success"]:
+            file_path.unlink(missing_ok=True)
             raise HTTPException(status_code=400, detail=result["error"])
 
         # 广播上传成功消息
         update = RealTimeUpdate(
             type="model_uploaded",
             model_id=result["model_id"],
-            data={"filename": file.filename, "format": model_format.value}
+            data={"filename": filename, "format": model_format.value}
         )
-        await manager.broadcast(update.json())
+        await manager.broadcast(update)
 
         return result
 
@@ -126,10 +183,10 @@ async def analyze_model(
     """分析3D模型"""
     try:
         # 设置模型ID（从路径参数获取）
-        request.model_id = model_id
+        request = request.model_copy(update={"model_id": model_id})
 
-        # 执行分析
-        result = agent.analyze_model(request)
+        # 执行分析（在线程池中执行，避免阻塞事件循环）
+        result = await run_in_threadpool(agent.analyze_model, request)
 
         # 广播分析结果
         if result.success:
@@ -142,7 +199,7 @@ async def analyze_model(
                     "execution_time": result.execution_time
                 }
             )
-            await manager.broadcast(update.json())
+            await manager.broadcast(update)
 
         return result
 
@@ -168,6 +225,23 @@ async def get_model_info(model_id: str):
     return model_info
 
 
+@app.get("/api/models/{model_id}/download")
+async def download_model(model_id: str):
+    """下载模型原始文件"""
+    model_info = agent.get_model_info(model_id)
+    file_path = agent.get_model_file_path(model_id)
+
+    if not model_info or not file_path or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail=f"模型文件不存在: {model_id}")
+
+    # Reason: FileResponse按块流式发送文件（传输层支持时使用零拷贝），大网格不会整体读入内存
+    return FileResponse(
+        file_path,
+        media_type="application/octet-stream",
+        filename=model_info.file_name
+    )
+
+
 @app.delete("/api/models/{model_id}")
 async def delete_model(model_id: str):
     """删除模型"""
@@ -182,7 +256,7 @@ async def delete_model(model_id: str):
         model_id=model_id,
         data={"message": "模型已删除"}
     )
-    await manager.broadcast(update.json())
+    await manager.broadcast(update)
 
     return {"message": "模型删除成功"}
 
@@ -214,7 +288,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 model_id="",
                 data={"original_message": data}
             )
-            await manager.send_personal_message(response.json(), websocket)
+            await manager.send_personal_message(_serialize_update(response), websocket)
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -225,10 +299,10 @@ async def http_exception_handler(request, exc):
     """HTTP异常处理器"""
     return JSONResponse(
         status_code=exc.status_code,
-        content=ErrorResponse(
-            error=exc.detail,
-            state_id=agent.get_current_state()
-        ).dict()
+        content=_ERROR_TEMPLATE | {
+            "error": exc.detail,
+            "state_id": agent.get_current_state()
+        }
     )
 
 
@@ -237,16 +311,16 @@ async def general_exception_handler(request, exc):
     """通用异常处理器"""
     return JSONResponse(
         status_code=500,
-        content=ErrorResponse(
-            error="内部服务器错误",
-            details={"message": str(exc)},
-            state_id=agent.get_current_state()
-        ).dict()
+        content=_ERROR_TEMPLATE | {
+            "error": "内部服务器错误",
+            "details": {"message": str(exc)},
+            "state_id": agent.get_current_state()
+        }
     )
 
 
 # 创建上传目录
-os.makedirs("uploads", exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # 挂载静态文件（用于前端）
 # 前端独立部署，暂时注释静态文件挂载
@@ -255,4 +329,16 @@ os.makedirs("uploads", exist_ok=True)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+
+    # Reason: 模型缓存保存在进程内存中，多个worker之间不共享，因此默认只启动一个worker
+    workers = int(os.getenv("WORKERS", "1"))
+
+    # 安装 speedups 后 uvicorn 会自动选用 uvloop 事件循环和 httptools 解析器
+    uvicorn.run(
+        app if workers == 1 else "nl_mesh_inspect.api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=workers
+    )
\ No newline at end of file
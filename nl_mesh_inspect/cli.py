@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import Optional
 
 from nl_mesh_inspect.agent import NLMeshInspectAgent
-from nl_mesh_inspect.models import AnalysisRequest, ModelFormat
+from nl_mesh_inspect.models import AnalysisRequest, ModelFormat, VALID_FORMATS
 
 
 def main():
@@ -30,7 +30,7 @@ def main():
     upload_parser = subparsers.add_parser('upload', help='上传3D模型')
     upload_parser.add_argument('file_path', help='模型文件路径')
     upload_parser.add_argument('--format', required=True,
-                              choices=['stl', 'obj', 'ply', 'step'],
+                              choices=[f.value for f in ModelFormat],
                               help='模型文件格式')
 
     # analyze 命令
@@ -202,6 +202,9 @@ def handle_interactive_upload(agent: NLMeshInspectAgent, command: str) -> Option
 
     file_path = parts[1]
     file_format = parts[2]
+    if file_format not in VALID_FORMATS:
+        print(f"错误: 不支持的格式: {file_format}")
+        return None
 
     try:
         with open(file_path, 'rb') as f:
@@ -2,36 +2,76 @@
 LangGraph智能体模块 - 使用LangGraph状态机架构的智能体
 """
 
-from typing import Dict, Any, List, Optional
+from typing import BinaryIO, Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
+from collections import OrderedDict
+import copy
+import itertools
+import threading
+import time
 import uuid
 
 from nl_mesh_inspect.models import (
     AnalysisRequest, AnalysisResult, ModelInfo, GeometricFeature, TopologyCheckResult
 )
 from nl_mesh_inspect.nlp_engine import QueryParser
-from nl_mesh_inspect.tools import GeometryAnalyzer, ModelProcessor
+from nl_mesh_inspect.tools import GeometryAnalyzer, ModelProcessor, mesh_kernel_arrays, warmup_kernels
 from nl_mesh_inspect.prompts import SystemPrompts, ResponseTemplates
 
 
 class LangGraphNLMeshAgent:
     """基于LangGraph的NL-Mesh-Inspect智能体（简化实现）"""
 
+    # 每个模型最多缓存的分析结果条数（按最近使用淘汰）
+    analysis_cache_maxsize: int = 128
+    # 去除首尾空白后的最短有效查询长度
+    min_query_length: int = 2
+    # 常驻内存的网格数量上限，超出后释放最久未使用的网格，需要时从文件重新加载
+    max_resident_meshes: int = 8
+
     def __init__(self, upload_dir: str = "uploads"):
         self.upload_dir = upload_dir
         self.query_parser = QueryParser()
         self.model_processor = ModelProcessor(upload_dir)
         self.geometry_analyzer = GeometryAnalyzer()
 
-        # 模型缓存
-        self.model_cache: Dict[str, Dict[str, Any]] = {}
+        # 模型缓存（按最近使用排序，模型信息始终保留，网格按需加载）
+        self.model_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._model_cache_lock = threading.RLock()
+        # 分析结果缓存：model_id -> {(query_type, parameters): 分析数据}
+        self.analysis_cache: Dict[str, "OrderedDict[Tuple, Dict[str, Any]]"] = {}
         self.current_state_id: str = str(uuid.uuid4())
+        self._state_counter = itertools.count(1)
+
+        # Reason: 首次JIT编译可能耗时数秒，在后台预热，与用户上传模型的时间重叠
+        self._warmup_thread = threading.Thread(target=self._warmup_kernels, daemon=True)
+        self._warmup_thread.start()
+
+    def _warmup_kernels(self) -> None:
+        """在后台线程中预热几何计算内核"""
+        try:
+            warmup_kernels()
+        except Exception:
+            # 预热失败不影响主要功能，首次调用时会重新编译
+            pass
 
     def analyze_model(self, request: AnalysisRequest) -> AnalysisResult:
         """分析模型 - 主入口点"""
-        start_time = datetime.now()
+        start_time = time.perf_counter()
 
         try:
+            # 空查询或过短的查询无需解析，直接返回
+            query = request.natural_language_query.strip()
+            if len(query) < self.min_query_length:
+                return AnalysisResult(
+                    success=False,
+                    result_type="invalid_query",
+                    data={"query": request.natural_language_query},
+                    message="查询内容过短，请输入完整的查询",
+                    execution_time=time.perf_counter() - start_time,
+                    state_id=self.current_state_id
+                )
+
             # 验证状态ID
             if request.state_id != self.current_state_id:
                 return AnalysisResult(
@@ -43,41 +83,42 @@ class LangGraphNLMeshAgent:
                     state_id=self.current_state_id
                 )
 
-            # 检查模型是否存在
-            if request.model_id not in self.model_cache:
+            # 解析自然语言查询（在查找模型之前，无效查询无需访问模型缓存）
+            parsed_query = self.query_parser.parse_query_cached(query)
+
+            if not parsed_query["is_valid"]:
                 return AnalysisResult(
                     success=False,
-                    result_type="model_not_found",
-                    data={"model_id": request.model_id},
-                    message=f"未找到模型: {request.model_id}",
+                    result_type="invalid_query",
+                    data={"parsed_query": parsed_query},
+                    message="无法理解查询意图，请重新表述",
                     execution_time=0.0,
                     state_id=self.current_state_id
                 )
 
-            # 解析自然语言查询
-            parsed_query = self.query_parser.parse_query(request.natural_language_query)
-
-            if not parsed_query["is_valid"]:
+            # 检查模型是否存在
+            if request.model_id not in self.model_cache:
                 return AnalysisResult(
                     success=False,
-                    result_type="invalid_query",
-                    data={"parsed_query": parsed_query},
-                    message="无法理解查询意图，请重新表述",
+                    result_type="model_not_found",
+                    data={"model_id": request.model_id},
+                    message=f"未找到模型: {request.model_id}",
                     execution_time=0.0,
                     state_id=self.current_state_id
                 )
 
-            # 获取模型数据
-            model_data = self.model_cache[request.model_id]
-            mesh = model_data["mesh"]
+            # 获取模型网格（已释放的网格会从文件重新加载）
+            mesh = self._get_mesh(request.model_id)
 
             # 执行分析
-            result_data = self._execute_specific_analysis(parsed_query, mesh, request.parameters)
+            result_data = self._execute_specific_analysis(
+                parsed_query, mesh, request.parameters, model_id=request.model_id
+            )
 
             # 生成响应消息
             message = self._generate_response_message(parsed_query, result_data)
 
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
 
             return AnalysisResult(
                 success=True,
@@ -90,7 +131,7 @@ class LangGraphNLMeshAgent:
             )
 
         except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             return AnalysisResult(
                 success=False,
                 result_type="analysis_error",
@@ -100,38 +141,76 @@ class LangGraphNLMeshAgent:
                 state_id=self.current_state_id
             )
 
-    def _execute_specific_analysis(self, parsed_query: Dict[str, Any], mesh, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    def _execute_specific_analysis(self, parsed_query: Dict[str, Any], mesh, parameters: Dict[str, Any],
+                                   model_id: Optional[str] = None) -> Dict[str, Any]:
         """执行具体的分析操作"""
         query_type = parsed_query["query_type"]
         entities = parsed_query["entities"]
 
-        result_data = {
-            "query_type": query_type,
-            "entities": entities,
-            "parameters": parameters
-        }
-
+        # Reason: 分析结果只依赖于不可变的网格和参数，同一模型的重复查询可直接复用
+        cache_key = self._analysis_cache_key(query_type, parameters)
+        model_analysis_cache = None
+        if model_id is not None and cache_key is not None:
+            model_analysis_cache = self.analysis_cache.setdefault(model_id, OrderedDict())
+            cached = model_analysis_cache.get(cache_key)
+            if cached is not None:
+                model_analysis_cache.move_to_end(cache_key)
+                return self._with_envelope(parsed_query, parameters, copy.deepcopy(cached))
+
+        # Reason: 上传时已计算的结果（内核数组、特征）只依赖于网格，直接复用
+        model_data = (self.model_cache.get(model_id) if model_id is not None else None) or {}
+        analysis: Dict[str, Any] = {}
         if query_type == "measurement":
-            result_data.update(self._perform_measurement(mesh, entities, parameters))
+            analysis = self._perform_measurement(mesh, entities, parameters, model_data.get("kernel_arrays"))
         elif query_type == "feature_detection":
-            result_data.update(self._perform_feature_detection(mesh, entities, parameters))
+            analysis = self._perform_feature_detection(mesh, entities, parameters, model_data.get("features"))
         elif query_type == "topology_check":
-            result_data.update(self._perform_topology_check(mesh))
+            analysis = self._perform_topology_check(mesh)
         elif query_type == "selection":
-            result_data.update(self._perform_selection(mesh, entities, parameters))
+            analysis = self._perform_selection(mesh, entities, parameters)
+
+        if model_analysis_cache is not None:
+            model_analysis_cache[cache_key] = copy.deepcopy(analysis)
+            if len(model_analysis_cache) > self.analysis_cache_maxsize:
+                model_analysis_cache.popitem(last=False)
 
-        return result_data
+        return self._with_envelope(parsed_query, parameters, analysis)
 
-    def _perform_measurement(self, mesh, entities: List[Dict], parameters: Dict) -> Dict[str, Any]:
+    @staticmethod
+    def _with_envelope(parsed_query: Dict[str, Any], parameters: Dict[str, Any],
+                       analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """将查询信息与分析数据合并为结果数据（单次构造）"""
+        return {
+            "query_type": parsed_query["query_type"],
+            "entities": parsed_query["entities"],
+            "parameters": parameters,
+            **analysis
+        }
+
+    def _analysis_cache_key(self, query_type: str, parameters: Dict[str, Any]) -> Optional[Tuple]:
+        """生成分析缓存键，参数不可排序或不可哈希时返回None（不缓存）"""
+        try:
+            key = (query_type, tuple(sorted(parameters.items())))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _perform_measurement(self, mesh, entities: List[Dict], parameters: Dict,
+                             kernel_arrays: Optional[Tuple] = None) -> Dict[str, Any]:
         """执行测量操作"""
         measurements = {}
-        measurements["volume"] = self.geometry_analyzer.measure_volume(mesh)
-        measurements["surface_area"] = self.geometry_analyzer.measure_surface_area(mesh)
+        volume, surface_area = self.geometry_analyzer.measure_volume_and_area(mesh, kernel_arrays)
+        measurements["volume"] = volume
+        measurements["surface_area"] = surface_area
         return {"measurements": measurements}
 
-    def _perform_feature_detection(self, mesh, entities: List[Dict], parameters: Dict) -> Dict[str, Any]:
+    def _perform_feature_detection(self, mesh, entities: List[Dict], parameters: Dict,
+                                   features: Optional[List[GeometricFeature]] = None) -> Dict[str, Any]:
         """执行特征检测"""
-        features = self.geometry_analyzer.detect_features(mesh)
+        if features is None:
+            features = self.geometry_analyzer.detect_features(mesh)
+        features = list(features)
         filtered_features = self._filter_features_by_parameters(features, parameters)
         return {
             "features": filtered_features,
@@ -141,8 +220,9 @@ class LangGraphNLMeshAgent:
 
     def _perform_topology_check(self, mesh) -> Dict[str, Any]:
         """执行拓扑检查"""
-        topology_result = self.geometry_analyzer.check_topology(mesh)
-        return {"topology": topology_result.dict()}
+        # 明确的拓扑查询进行完整检查（上传时的拓扑结果不包括自相交检查）
+        topology_result = self.geometry_analyzer.check_topology(mesh, detailed=True)
+        return {"topology": topology_result.model_dump()}
 
     def _perform_selection(self, mesh, entities: List[Dict], parameters: Dict) -> Dict[str, Any]:
         """执行选择操作"""
@@ -168,7 +248,10 @@ class LangGraphNLMeshAgent:
                 )
         elif query_type == "feature_detection":
             features = result_data.get("features", [])
-            return ResponseTemplates.feature_detection_result(features)
+            # 响应模板按字典的type字段统计特征类型
+            return ResponseTemplates.feature_detection_result(
+                [{"type": feature.entity_type.value} for feature in features]
+            )
         elif query_type == "topology_check":
             topology = result_data.get("topology", {})
             return ResponseTemplates.topology_check_result(topology)
@@ -181,34 +264,55 @@ class LangGraphNLMeshAgent:
         return "分析完成"
 
     # 以下方法保持与原有接口兼容
-    def process_upload(self, file_content: bytes, filename: str, file_format: str) -> Dict[str, Any]:
-        """处理模型上传"""
+    def process_upload(self, file_content: Union[bytes, BinaryIO], filename: str, file_format: str) -> Dict[str, Any]:
+        """处理模型上传（file_content可为字节串或二进制文件对象）"""
         try:
             file_path = self.model_processor.save_uploaded_file(file_content, filename)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "state_id": self.current_state_id
+            }
+        return self.process_upload_path(file_path, filename, file_format)
+
+    def process_upload_path(self, file_path: str, filename: str, file_format: str) -> Dict[str, Any]:
+        """处理已写入磁盘的模型文件（流式上传，避免整个文件驻留内存）"""
+        try:
             processing_result = self.model_processor.process_model(file_path, file_format)
 
             model_id = str(uuid.uuid4())
-            model_info = processing_result["model_info"]
-            model_info.model_id = model_id
-            model_info.file_name = filename
-            model_info.file_format = file_format
-            model_info.upload_time = datetime.now()
-            model_info.features = processing_result["features"]
-
-            self.model_cache[model_id] = {
-                "mesh": processing_result["mesh"],
-                "model_info": model_info,
-                "topology_result": processing_result["topology_result"],
-                "file_path": file_path
-            }
-
-            self.current_state_id = str(uuid.uuid4())
+            model_info = processing_result["model_info"].model_copy(update={
+                "model_id": model_id,
+                "file_name": filename,
+                "file_format": file_format,
+                "upload_time": datetime.now(),
+                "features": processing_result["features"]
+            })
+            model_info_dict = model_info.model_dump()
+            topology_result_dict = processing_result["topology_result"].model_dump()
+
+            with self._model_cache_lock:
+                self.model_cache[model_id] = {
+                    "mesh": processing_result["mesh"],
+                    "kernel_arrays": processing_result.get("kernel_arrays"),
+                    "model_info": model_info,
+                    "model_info_dict": model_info_dict,
+                    "topology_result": processing_result["topology_result"],
+                    "topology_result_dict": topology_result_dict,
+                    "features": model_info.features,
+                    "file_path": file_path
+                }
+                self._release_cold_meshes()
+            self.analysis_cache.pop(model_id, None)
+
+            self._rotate_state()
 
             return {
                 "success": True,
                 "model_id": model_id,
-                "model_info": model_info.dict(),
-                "topology_result": processing_result["topology_result"].dict(),
+                "model_info": model_info_dict,
+                "topology_result": topology_result_dict,
                 "state_id": self.current_state_id
             }
 
@@ -219,20 +323,61 @@ class LangGraphNLMeshAgent:
                 "state_id": self.current_state_id
             }
 
+    def _get_mesh(self, model_id: str):
+        """获取模型网格，标记为最近使用；网格已被释放时从文件重新加载"""
+        with self._model_cache_lock:
+            model_data = self.model_cache[model_id]
+            self.model_cache.move_to_end(model_id)
+            mesh = model_data["mesh"]
+        if mesh is not None:
+            return mesh
+
+        # Reason: 加载可能耗时较长，在锁外进行，避免阻塞其他模型的分析
+        mesh = self.model_processor.geometry_analyzer.model_loader.load_model(
+            model_data["file_path"], model_data["model_info"].file_format
+        )
+        kernel_arrays = mesh_kernel_arrays(mesh)
+        with self._model_cache_lock:
+            if self.model_cache.get(model_id) is model_data:
+                model_data["mesh"] = mesh
+                model_data["kernel_arrays"] = kernel_arrays
+                self._release_cold_meshes()
+        return mesh
+
+    def _release_cold_meshes(self) -> None:
+        """释放超出常驻上限的最久未使用网格（调用方需持有缓存锁）"""
+        resident = [data for data in self.model_cache.values() if data["mesh"] is not None]
+        for model_data in resident[:max(len(resident) - self.max_resident_meshes, 0)]:
+            model_data["mesh"] = None
+            model_data["kernel_arrays"] = None
+
+    def _rotate_state(self) -> None:
+        """生成新的状态ID"""
+        # Reason: 状态ID只需在进程内唯一，毫秒时间戳加递增序号避免每次变更都读取系统随机源
+        self.current_state_id = f"{int(time.time() * 1000):x}-{next(self._state_counter)}"
+
     def get_model_info(self, model_id: str) -> Optional[ModelInfo]:
         """获取模型信息"""
         if model_id in self.model_cache:
             return self.model_cache[model_id]["model_info"]
         return None
 
+    def get_model_file_path(self, model_id: str) -> Optional[str]:
+        """获取模型文件在磁盘上的路径"""
+        if model_id in self.model_cache:
+            return self.model_cache[model_id]["file_path"]
+        return None
+
     def cleanup_model(self, model_id: str) -> bool:
         """清理模型数据"""
         try:
             if model_id in self.model_cache:
                 model_data = self.model_cache[model_id]
                 self.model_processor.cleanup_file(model_data["file_path"])
-                del self.model_cache[model_id]
-                self.current_state_id = str(uuid.uuid4())
+                with self._model_cache_lock:
+                    self.model_cache.pop(model_id, None)
+                self.analysis_cache.pop(model_id, None)
+                self._rotate_state()
                 return True
         except Exception:
             pass
@@ -2,247 +2,485 @@
 基于大模型的LangGraph智能体 - 使用DeepSeek-V3.1进行3D模型分析
 """
 
-from typing import Dict, Any, List, TypedDict, Annotated
+from typing import Callable, Dict, Any, Iterator, List, Mapping, Optional, Sequence, TypedDict, Annotated
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
+import copy
+import itertools
+import json
+import operator
+import os
+import re
+import threading
+import time
+import types
 import uuid
 
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import create_react_agent
+try:
+    import orjson
+except ImportError:
+    # orjson为可选依赖，未安装时使用标准库json序列化工具结果
+    orjson = None
 
-from nl_mesh_inspect.llm_config import llm_with_tools, execute_tool
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+
+from nl_mesh_inspect.llm_cache import LLMCache
+from nl_mesh_inspect.llm_config import TOOL_NAMES, llm_with_tools, execute_tool
 from nl_mesh_inspect.models import AnalysisRequest, AnalysisResult, ModelInfo
 from nl_mesh_inspect.tools import ModelProcessor
 
 
+# 状态ID = 进程标识 + 递增序号，只需在进程生命周期内唯一
+_PROCESS_TAG = uuid.uuid4().hex[:8]
+_state_counter = itertools.count()
+
+
+def _next_state_id() -> str:
+    """生成新的状态ID"""
+    # Reason: 每次上传/删除都调用uuid4会读取系统随机源，递增计数器开销可忽略（next()在GIL下是原子的）
+    return f"{_PROCESS_TAG}-{next(_state_counter)}"
+
+
+def _state_sequence(state_id: str) -> Optional[int]:
+    """解析本进程生成的状态ID的序号，非本进程生成的返回None"""
+    tag, _, sequence = state_id.rpartition("-")
+    if tag != _PROCESS_TAG or not sequence.isdigit():
+        return None
+    return int(sequence)
+
+
+# 综合分析类查询的关键词，LLM未选择工具时只对这类查询执行后备工具
+_FALLBACK_PATTERN = re.compile(r"分析|综合|全面|analy[sz]e|full|overview", re.IGNORECASE)
+# LLM未选择工具时执行的后备工具调用：(工具名称, 参数)，按名称经TOOL_DISPATCH分派
+_FALLBACK_TOOL_CALLS = (("MeasureVolumeTool", {}), ("CheckTopologyTool", {}))
+
+# 分析提示模板（模块加载时构建一次）
+# Reason: 系统消息不含任何变量，所有请求的提示前缀逐字节相同，便于服务端复用提示缓存；
+# 模型信息次之（同一模型的请求相同），每次都变化的用户查询放在最后
+_ANALYSIS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """你是一个3D模型分析专家，负责分析用户对3D模型的自然语言查询，并决定使用哪些工具来分析模型。
+
+可用的工具：
+- 测量工具：测量体积、表面积等
+- 特征检测工具：检测孔洞、面等特征
+- 拓扑分析工具：检查拓扑结构、连通性等
+
+请分析用户意图并决定使用哪些工具。"""),
+    ("human", """模型信息：
+- 文件名：{file_name}
+- 格式：{file_format}"""),
+    ("human", "请分析这个3D模型：{query}")
+])
+
+
+def _model_info_field(model_info: Any, name: str) -> str:
+    """读取模型信息字段，兼容ModelInfo对象和字典"""
+    if isinstance(model_info, dict):
+        value = model_info.get(name)
+    else:
+        value = getattr(model_info, name, None)
+    return "未知" if value is None else str(getattr(value, "value", value))
+
+
+class ModelCache(OrderedDict):
+    """模型缓存（LRU + 过期时间），条目被淘汰或过期时调用on_evict清理"""
+
+    def __init__(self, maxsize: int, ttl: float,
+                 on_evict: Optional[Callable[[str, Mapping[str, Any]], None]] = None,
+                 timer: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.timer = timer
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def __setitem__(self, key: str, value: Mapping[str, Any]) -> None:
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            self._expires[key] = self.timer() + self.ttl
+            self._evict_expired()
+            while len(self) > self.maxsize:
+                self._evict(next(iter(self)))
+
+    def __getitem__(self, key: str) -> Mapping[str, Any]:
+        with self._lock:
+            if self._expired(key):
+                self._evict(key)
+                raise KeyError(key)
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            super().__delitem__(key)
+            self._expires.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            if self._expired(key):
+                self._evict(key)
+            return super().__contains__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """按键获取模型数据，不存在或已过期时返回默认值"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _expired(self, key: object) -> bool:
+        expires = self._expires.get(key)
+        return expires is not None and expires <= self.timer()
+
+    def _evict_expired(self) -> None:
+        now = self.timer()
+        for key in [k for k, expires in self._expires.items() if expires <= now]:
+            self._evict(key)
+
+    def _evict(self, key: str) -> None:
+        """移除条目并调用淘汰回调（回调失败不影响缓存）"""
+        value = super().__getitem__(key)
+        del self[key]
+        if self.on_evict is not None:
+            try:
+                self.on_evict(key, value)
+            except Exception:
+                pass
+
+
 class AgentState(TypedDict):
     """智能体状态定义"""
 
     # 输入
     request: AnalysisRequest
+    expected_state_id: str
 
-    # 中间状态
-    messages: Annotated[List[Dict[str, Any]], "messages"]
-    mesh_data: Dict[str, Any]
+    # 中间状态（节点只返回新增的消息，由LangGraph追加合并）
+    messages: Annotated[List[Any], operator.add]
+    mesh_data: Mapping[str, Any]
 
     # 执行结果
-    tool_results: List[Dict[str, Any]]
+    tool_results: Annotated[List[Dict[str, Any]], operator.add]
     final_result: AnalysisResult
 
     # 控制状态
     max_steps: int
     current_step: int
+    error: Optional[str]
+
+
+def _tool_content(result: Any) -> str:
+    """将工具结果序列化为工具消息内容（JSON），优先使用orjson"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                result, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            ).decode()
+        except TypeError:
+            # orjson无法处理的数据回退到标准库
+            pass
+    return json.dumps(result, ensure_ascii=False, default=str)
+
+
+def _tool_result_writer() -> Optional[Callable[[int, Dict[str, Any]], None]]:
+    """返回把单个工具结果写入LangGraph自定义流的回调，不在工作流中运行时返回None"""
+    from langgraph.config import get_stream_writer
+
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return None
+    return lambda index, result: writer({"tool_index": index, "tool_result": result})
+
+
+def _should_handle_error(state: AgentState) -> str:
+    """判断是否应该处理错误"""
+    return "error" if state.get("error") else "continue"
+
+
+def _agent_node(method_name: str) -> Callable[[AgentState, RunnableConfig], Any]:
+    """生成调用config中智能体同名方法的节点函数"""
+    def node(state: AgentState, config: RunnableConfig) -> Any:
+        return getattr(config["configurable"]["agent"], method_name)(state)
+
+    node.__name__ = method_name
+    return node
+
+
+@lru_cache(maxsize=None)
+def _compiled_workflow():
+    """构建并编译LangGraph工作流（进程内只编译一次）"""
+    # Reason: 延迟导入LangGraph，只使用模型管理接口的调用方无需支付其导入开销
+    from langgraph.graph import StateGraph, END
+
+    # 创建工作流图
+    workflow = StateGraph(AgentState)
+
+    # 添加节点
+    workflow.add_node("validate_input", _agent_node("_validate_input"))
+    workflow.add_node("load_model", _agent_node("_load_model"))
+    workflow.add_node("llm_analysis", _agent_node("_llm_analysis"))
+    workflow.add_node("execute_tools", _agent_node("_execute_tools"))
+    workflow.add_node("generate_final_result", _agent_node("_generate_final_result"))
+    workflow.add_node("handle_error", _agent_node("_handle_error"))
+
+    # 设置入口点
+    workflow.set_entry_point("validate_input")
+
+    # 添加条件边（正常流程与错误分支由同一个路由决定，每个节点只路由一次）
+    # Reason: 路由只读取状态，直接使用模块级函数，无需经由config查找智能体
+    workflow.add_conditional_edges(
+        "validate_input",
+        _should_handle_error,
+        {"error": "handle_error", "continue": "load_model"}
+    )
+
+    workflow.add_conditional_edges(
+        "load_model",
+        _should_handle_error,
+        {"error": "handle_error", "continue": "llm_analysis"}
+    )
+
+    workflow.add_conditional_edges(
+        "llm_analysis",
+        _should_handle_error,
+        {"error": "handle_error", "continue": "execute_tools"}
+    )
+
+    workflow.add_conditional_edges(
+        "execute_tools",
+        _should_handle_error,
+        {"error": "handle_error", "continue": "generate_final_result"}
+    )
+
+    workflow.add_edge("generate_final_result", END)
+    workflow.add_edge("handle_error", END)
+
+    return workflow.compile()
 
 
 class LLMNLMeshAgent:
     """基于大模型的NL-Mesh-Inspect智能体"""
 
+    # 并发执行工具调用的最大线程数
+    max_tool_workers: int = 8
+    # 批量分析时同时执行的最大请求数
+    max_batch_concurrency: int = 16
+    # 模型缓存最多保留的模型数和自注册起的过期时间（秒），超出容量时淘汰最久未使用的模型并删除其文件
+    model_cache_maxsize: int = 32
+    model_cache_ttl: float = 3600.0
+
     def __init__(self, upload_dir: str = "uploads"):
         self.upload_dir = upload_dir
         self.model_processor = ModelProcessor(upload_dir)
-
-        # 模型缓存
-        self.model_cache: Dict[str, Dict[str, Any]] = {}
-        self.current_state_id: str = str(uuid.uuid4())
-
-        # 构建LangGraph工作流
-        self.workflow = self._build_workflow()
-
-    def _build_workflow(self) -> StateGraph:
-        """构建LangGraph工作流"""
-
-        # 创建工作流图
-        workflow = StateGraph(AgentState)
-
-        # 添加节点
-        workflow.add_node("validate_input", self._validate_input)
-        workflow.add_node("load_model", self._load_model)
-        workflow.add_node("llm_analysis", self._llm_analysis)
-        workflow.add_node("execute_tools", self._execute_tools)
-        workflow.add_node("generate_final_result", self._generate_final_result)
-        workflow.add_node("handle_error", self._handle_error)
-
-        # 设置入口点
-        workflow.set_entry_point("validate_input")
-
-        # 添加边（正常流程）
-        workflow.add_edge("validate_input", "load_model")
-        workflow.add_edge("load_model", "llm_analysis")
-        workflow.add_edge("llm_analysis", "execute_tools")
-        workflow.add_edge("execute_tools", "generate_final_result")
-        workflow.add_edge("generate_final_result", END)
-
-        # 添加条件边
-        workflow.add_conditional_edges(
-            "validate_input",
-            self._should_handle_error,
-            {"error": "handle_error", "continue": "load_model"}
-        )
-
-        workflow.add_conditional_edges(
-            "load_model",
-            self._should_handle_error,
-            {"error": "handle_error", "continue": "llm_analysis"}
-        )
-
-        workflow.add_conditional_edges(
-            "llm_analysis",
-            self._should_handle_error,
-            {"error": "handle_error", "continue": "execute_tools"}
+        # 线程按需创建，空闲时不占用资源
+        self._tool_executor = ThreadPoolExecutor(
+            max_workers=self.max_tool_workers, thread_name_prefix="mesh-tool"
         )
 
-        workflow.add_conditional_edges(
-            "execute_tools",
-            self._should_handle_error,
-            {"error": "handle_error", "continue": "generate_final_result"}
+        # 模型缓存
+        self.model_cache: ModelCache = ModelCache(
+            self.model_cache_maxsize, self.model_cache_ttl, on_evict=self._on_model_evicted
         )
+        self.current_state_id: str = _next_state_id()
 
-        workflow.add_edge("handle_error", END)
-
-        return workflow.compile()
+        # LLM响应缓存
+        self.llm_cache = LLMCache()
 
-    def _should_handle_error(self, state: AgentState) -> str:
-        """判断是否应该处理错误"""
-        return "error" if state.get("error") else "continue"
+        # Reason: 图结构与实例无关，全部实例共享同一个编译好的工作流，通过config把节点绑定到当前智能体
+        self.workflow = _compiled_workflow().with_config(configurable={"agent": self})
 
-    def _validate_input(self, state: AgentState) -> AgentState:
+    # 节点只返回发生变化的状态键，由LangGraph合并到状态中
+    def _validate_input(self, state: AgentState) -> Dict[str, Any]:
         """验证输入参数"""
         try:
             request = state["request"]
 
-            # 验证状态ID
-            if request.state_id != self.current_state_id:
-                state["error"] = f"状态ID不匹配: 期望 {self.current_state_id}, 实际 {request.state_id}"
-                return state
+            # 验证状态ID：优先按模型自身的状态校验，其他模型的上传/删除不会使请求失效
+            model_state_id = self.model_cache.get(request.model_id, {}).get("state_id")
+            if model_state_id is not None:
+                if not self._is_state_current(request.state_id, model_state_id):
+                    return {"error": f"状态ID不匹配: 期望 {model_state_id} 或更新的状态, 实际 {request.state_id}"}
+            else:
+                # 没有模型级状态时使用入口处记录的全局状态快照
+                expected_state_id = state.get("expected_state_id", self.current_state_id)
+                if request.state_id != expected_state_id:
+                    return {"error": f"状态ID不匹配: 期望 {expected_state_id}, 实际 {request.state_id}"}
 
             # 验证模型ID
             if not request.model_id:
-                state["error"] = "缺少模型ID"
-                return state
+                return {"error": "缺少模型ID"}
 
             # 验证查询
             if not request.natural_language_query:
-                state["error"] = "缺少自然语言查询"
-                return state
+                return {"error": "缺少自然语言查询"}
 
-            return state
+            return {}
 
         except Exception as e:
-            state["error"] = f"输入验证错误: {str(e)}"
-            return state
-
-    def _load_model(self, state: AgentState) -> AgentState:
+            return {"error": f"输入验证错误: {str(e)}"}
+
+    @staticmethod
+    def _is_state_current(request_state_id: str, model_state_id: str) -> bool:
+        """判断请求的状态是否不早于模型注册时的状态"""
+        # Reason: 状态ID的序号单调递增，客户端持有模型注册时或之后签发的任何状态ID都已看到该模型
+        request_sequence = _state_sequence(request_state_id)
+        model_sequence = _state_sequence(model_state_id)
+        if request_sequence is None or model_sequence is None:
+            return request_state_id == model_state_id
+        return request_sequence >= model_sequence
+
+    def _load_model(self, state: AgentState) -> Dict[str, Any]:
         """加载模型数据"""
         try:
             request = state["request"]
 
-            if request.model_id not in self.model_cache:
-                state["error"] = f"未找到模型: {request.model_id}"
-                return state
+            model_data = self.model_cache.get(request.model_id)
+            if model_data is None:
+                return {"error": f"未找到模型: {request.model_id}"}
 
-            model_data = self.model_cache[request.model_id]
-            state["mesh_data"] = model_data
-
-            return state
+            # Reason: 节点之间共享只读视图，避免工具意外修改缓存内容；需要修改时应显式复制
+            if not isinstance(model_data, types.MappingProxyType):
+                model_data = types.MappingProxyType(model_data)
+            return {"mesh_data": model_data}
 
         except Exception as e:
-            state["error"] = f"模型加载错误: {str(e)}"
-            return state
+            return {"error": f"模型加载错误: {str(e)}"}
 
-    def _llm_analysis(self, state: AgentState) -> AgentState:
+    def _llm_analysis(self, state: AgentState) -> Dict[str, Any]:
         """使用LLM分析查询意图并决定使用哪些工具"""
         try:
             request = state["request"]
             mesh_data = state["mesh_data"]
 
-            # 构建系统消息
-            system_message = {
-                "role": "system",
-                "content": f"""
-                你是一个3D模型分析专家，负责分析用户对3D模型的自然语言查询，并决定使用哪些工具来分析模型。
-
-                可用的工具：
-                - 测量工具：测量体积、表面积等
-                - 特征检测工具：检测孔洞、面等特征
-                - 拓扑分析工具：检查拓扑结构、连通性等
+            model_info = mesh_data.get("model_info") or {}
 
-                模型信息：
-                - 文件名：{mesh_data.get('model_info', {}).get('file_name', '未知')}
-                - 格式：{mesh_data.get('model_info', {}).get('file_format', '未知')}
-
-                用户查询：{request.natural_language_query}
-
-                请分析用户意图并决定使用哪些工具。
-                """
-            }
+            # 使用预先构建的提示模板生成系统消息和用户消息
+            messages = _ANALYSIS_PROMPT.format_messages(
+                file_name=_model_info_field(model_info, "file_name"),
+                file_format=_model_info_field(model_info, "file_format"),
+                query=request.natural_language_query
+            )
 
-            # 构建用户消息
-            user_message = {
-                "role": "user",
-                "content": f"请分析这个3D模型：{request.natural_language_query}"
-            }
+            # 调用LLM（相同提示的确定性调用直接复用缓存的响应）
+            response = self._invoke_llm(messages, use_cache=not request.no_cache)
 
-            # 初始化消息列表
-            state["messages"] = [system_message, user_message]
+            # 添加LLM响应到消息列表（保留原始消息对象，工具执行阶段需要读取其tool_calls）
+            messages.append(response)
 
-            # 调用LLM
-            response = llm_with_tools.invoke(state["messages"])
+            return {"messages": messages}
 
-            # 添加LLM响应到消息列表
-            state["messages"].append({
-                "role": "assistant",
-                "content": response.content
+        except Exception as e:
+            return {"error": f"LLM分析错误: {str(e)}"}
+
+    def _invoke_llm(self, messages: List[Dict[str, Any]], use_cache: bool = True):
+        """调用LLM，命中响应缓存时跳过模型调用（use_cache为False时总是调用模型）"""
+        key = LLMCache.cache_key(
+            getattr(llm_with_tools, "model_name", type(llm_with_tools).__name__),
+            messages,
+            TOOL_NAMES,
+            getattr(llm_with_tools, "temperature", 0.0)
+        ) if use_cache else None
+        if key is not None:
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                return AIMessage(content=cached["content"], tool_calls=copy.deepcopy(cached["tool_calls"]))
+
+        response = llm_with_tools.invoke(messages)
+
+        if key is not None:
+            self.llm_cache.set(key, {
+                "content": response.content,
+                "tool_calls": copy.deepcopy(list(getattr(response, "tool_calls", None) or []))
             })
+        return response
 
-            # 初始化工具结果列表
-            state["tool_results"] = []
+    @property
+    def llm_cache_stats(self) -> Dict[str, int]:
+        """LLM响应缓存的命中统计"""
+        return dict(self.llm_cache.stats)
 
-            return state
-
-        except Exception as e:
-            state["error"] = f"LLM分析错误: {str(e)}"
-            return state
-
-    def _execute_tools(self, state: AgentState) -> AgentState:
+    def _execute_tools(self, state: AgentState) -> Dict[str, Any]:
         """执行LLM选择的工具"""
         try:
             if not state.get("messages"):
-                state["error"] = "没有可用的LLM响应"
-                return state
+                return {"error": "没有可用的LLM响应"}
 
             # 获取最后一个LLM响应
             last_message = state["messages"][-1]
 
             # 检查是否有工具调用
             if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-                for tool_call in last_message.tool_calls:
-                    tool_name = tool_call["name"]
-                    tool_args = tool_call["args"]
-
-                    # 执行工具
-                    result = execute_tool(tool_name, tool_args, state["mesh_data"])
-                    state["tool_results"].append(result)
-
-                    # 添加工具执行结果到消息列表
-                    state["messages"].append({
-                        "role": "tool",
-                        "content": str(result),
-                        "tool_call_id": tool_call["id"]
-                    })
-
-            # 如果没有工具调用，模拟一些工具执行
-            elif not state.get("tool_results"):
+                tool_calls = last_message.tool_calls
+                results = self._run_tools(
+                    [(tool_call["name"], tool_call["args"]) for tool_call in tool_calls],
+                    state["mesh_data"],
+                    on_result=_tool_result_writer()
+                )
+
+                # 按工具调用的原始顺序记录结果，保持tool_call_id对应关系
+                return {
+                    "tool_results": results,
+                    "messages": [
+                        {
+                            "role": "tool",
+                            "content": _tool_content(result),
+                            "tool_call_id": tool_call["id"]
+                        }
+                        for tool_call, result in zip(tool_calls, results)
+                    ]
+                }
+
+            # 如果没有工具调用，仅对综合分析类查询模拟一些工具执行
+            elif not state.get("tool_results") and self._should_fallback(
+                    state["request"].natural_language_query):
                 # 模拟执行一些工具
-                result1 = execute_tool("MeasureVolumeTool", {}, state["mesh_data"])
-                result2 = execute_tool("CheckTopologyTool", {}, state["mesh_data"])
-                state["tool_results"].extend([result1, result2])
+                return {"tool_results": self._run_tools(
+                    _FALLBACK_TOOL_CALLS,
+                    state["mesh_data"],
+                    on_result=_tool_result_writer()
+                )}
 
-            return state
+            return {}
 
         except Exception as e:
-            state["error"] = f"工具执行错误: {str(e)}"
-            return state
+            return {"error": f"工具执行错误: {str(e)}"}
+
+    @staticmethod
+    def _should_fallback(query: str) -> bool:
+        """判断查询是否需要在LLM未选择工具时执行后备工具"""
+        return _FALLBACK_PATTERN.search(query) is not None
+
+    def _run_tools(self, calls: Sequence[tuple], mesh_data: Mapping[str, Any],
+                   on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """执行多个相互独立的工具调用，结果按调用顺序返回；on_result在每个工具完成时以(调用序号, 结果)调用"""
+        if len(calls) <= 1:
+            results = [execute_tool(name, args, mesh_data) for name, args in calls]
+            if on_result is not None:
+                for index, result in enumerate(results):
+                    on_result(index, result)
+            return results
+
+        # Reason: 工具之间相互独立，并发执行使总耗时取决于最慢的工具而不是所有工具之和
+        futures = {
+            self._tool_executor.submit(execute_tool, name, args, mesh_data): index
+            for index, (name, args) in enumerate(calls)
+        }
+        if on_result is not None:
+            # 按完成顺序通知，调用方无需等待最慢的工具即可拿到已完成的结果
+            for future in as_completed(futures):
+                on_result(futures[future], future.result())
+        return [future.result() for future in futures]
 
-    def _generate_final_result(self, state: AgentState) -> AgentState:
+    def _generate_final_result(self, state: AgentState) -> Dict[str, Any]:
         """生成最终分析结果"""
         try:
             request = state["request"]
@@ -256,7 +494,10 @@ class LLMNLMeshAgent:
             }
 
             # 生成响应消息
-            message = f"分析完成。使用了 {len(tool_results)} 个工具进行分析。"
+            if tool_results:
+                message = f"分析完成。使用了 {len(tool_results)} 个工具进行分析。"
+            else:
+                message = "分析完成。未调用任何工具。"
 
             # 创建最终结果
             final_result = AnalysisResult(
@@ -269,14 +510,12 @@ class LLMNLMeshAgent:
                 state_id=self.current_state_id
             )
 
-            state["final_result"] = final_result
-            return state
+            return {"final_result": final_result}
 
         except Exception as e:
-            state["error"] = f"结果生成错误: {str(e)}"
-            return state
+            return {"error": f"结果生成错误: {str(e)}"}
 
-    def _handle_error(self, state: AgentState) -> AgentState:
+    def _handle_error(self, state: AgentState) -> Dict[str, Any]:
         """处理错误"""
         error_message = state.get("error", "未知错误")
 
@@ -289,16 +528,60 @@ class LLMNLMeshAgent:
             state_id=self.current_state_id
         )
 
-        state["final_result"] = final_result
-        return state
+        return {"final_result": final_result}
 
     def analyze_model(self, request: AnalysisRequest) -> AnalysisResult:
         """分析模型 - 主入口点"""
-        start_time = datetime.now()
+        start_time = time.perf_counter()
+
+        # 执行工作流
+        final_state = self.workflow.invoke(self._initial_state(request))
+
+        return self._final_result(final_state, time.perf_counter() - start_time)
+
+    def stream_analysis(self, request: AnalysisRequest) -> Iterator[Dict[str, Any]]:
+        """流式分析模型：每个工具完成时产出{"tool_index", "tool_result"}，最后产出{"final_result"}"""
+        start_time = time.perf_counter()
+
+        final_state: Dict[str, Any] = {}
+        for mode, chunk in self.workflow.stream(self._initial_state(request), stream_mode=["custom", "values"]):
+            if mode == "custom":
+                yield chunk
+            else:
+                final_state = chunk
+
+        yield {"final_result": self._final_result(final_state, time.perf_counter() - start_time)}
+
+    def analyze_model_batch(self, requests: List[AnalysisRequest]) -> List[AnalysisResult]:
+        """批量分析模型，请求并发执行，结果按输入顺序返回"""
+        start_time = time.perf_counter()
+
+        initial_states = [self._initial_state(request) for request in requests]
+        final_states = self.workflow.batch(
+            initial_states, config={"max_concurrency": self.max_batch_concurrency}
+        )
+
+        execution_time = time.perf_counter() - start_time
+        return [self._final_result(state, execution_time) for state in final_states]
+
+    async def aanalyze_model_batch(self, requests: List[AnalysisRequest]) -> List[AnalysisResult]:
+        """异步批量分析模型，结果按输入顺序返回"""
+        start_time = time.perf_counter()
+
+        initial_states = [self._initial_state(request) for request in requests]
+        final_states = await self.workflow.abatch(
+            initial_states, config={"max_concurrency": self.max_batch_concurrency}
+        )
+
+        execution_time = time.perf_counter() - start_time
+        return [self._final_result(state, execution_time) for state in final_states]
 
-        # 初始化状态
-        initial_state: AgentState = {
+    def _initial_state(self, request: AnalysisRequest) -> AgentState:
+        """构建工作流初始状态"""
+        return {
             "request": request,
+            # Reason: 在入口处记录状态ID快照，批量并发执行期间的上传/删除不会影响同批请求的校验
+            "expected_state_id": self.current_state_id,
             "messages": [],
             "mesh_data": {},
             "tool_results": [],
@@ -307,15 +590,12 @@ class LLMNLMeshAgent:
             "current_step": 0
         }
 
-        # 执行工作流
-        final_state = self.workflow.invoke(initial_state)
-
-        # 计算执行时间
-        execution_time = (datetime.now() - start_time).total_seconds()
-
-        # 更新执行时间
-        if final_state.get("final_result"):
-            final_state["final_result"].execution_time = execution_time
+    def _final_result(self, final_state: Dict[str, Any], execution_time: float) -> AnalysisResult:
+        """从工作流最终状态中取出分析结果并记录执行时间"""
+        # 更新执行时间（结果模型不可变，复制一份并写入执行时间）
+        final_result = final_state.get("final_result")
+        if final_result:
+            return final_result.model_copy(update={"execution_time": execution_time})
 
         return final_state.get("final_result", AnalysisResult(
             success=False,
@@ -329,22 +609,43 @@ class LLMNLMeshAgent:
     # 以下方法保持与原有接口兼容
     def process_upload(self, file_content: bytes, filename: str, file_format: str) -> Dict[str, Any]:
         """处理模型上传"""
+        return self._register_model(filename, file_format, f"/uploads/{filename}", 1024)  # 模拟文件大小
+
+    def process_upload_path(self, file_path: str, filename: str, file_format: str) -> Dict[str, Any]:
+        """处理已写入磁盘的模型文件（流式上传，避免整个文件驻留内存）"""
+        try:
+            file_size = os.path.getsize(file_path)
+        except OSError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "state_id": self.current_state_id
+            }
+        return self._register_model(filename, file_format, file_path, file_size)
+
+    def _register_model(self, filename: str, file_format: str, file_path: str, file_size: int) -> Dict[str, Any]:
+        """注册模型到缓存"""
         try:
             # 模拟模型处理
             model_id = str(uuid.uuid4())
 
             # 创建模拟模型数据
-            from nl_mesh_inspect.models import ModelInfo, TopologyCheckResult
+            from nl_mesh_inspect.models import ModelInfo, TopologyCheckResult, mesh_signature
 
+            vertex_count = 100  # 模拟顶点数
+            face_count = 200  # 模拟面数
+            bounding_box = [0, 0, 0, 10, 10, 10]  # 边界框 [min_x, min_y, min_z, max_x, max_y, max_z]
             model_info = ModelInfo(
                 model_id=model_id,
                 file_name=filename,
                 file_format=file_format,
                 upload_time=datetime.now(),
-                file_size=1024,  # 模拟文件大小
-                vertex_count=100,  # 模拟顶点数
-                face_count=200,  # 模拟面数
-                bounding_box=[0, 0, 0, 10, 10, 10],  # 边界框 [min_x, min_y, min_z, max_x, max_y, max_z]
+                file_size=file_size,
+                vertex_count=vertex_count,
+                face_count=face_count,
+                bounding_box=bounding_box,
+                extents=[10, 10, 10],
+                signature=mesh_signature(vertex_count, face_count, bounding_box),
                 features=[]
             )
 
@@ -355,20 +656,27 @@ class LLMNLMeshAgent:
                 issues=[]
             )
 
-            self.model_cache[model_id] = {
+            # Reason: 序列化结果与模型对象一起缓存，后续需要字典形式时无需再次遍历模型
+            model_info_dict = model_info.model_dump()
+            topology_result_dict = topology_result.model_dump()
+
+            self.current_state_id = _next_state_id()
+
+            self.model_cache[model_id] = types.MappingProxyType({
                 "mesh": {"vertices": 100, "faces": 200},  # 模拟网格数据
                 "model_info": model_info,
+                "model_info_dict": model_info_dict,
                 "topology_result": topology_result,
-                "file_path": f"/uploads/{filename}"
-            }
-
-            self.current_state_id = str(uuid.uuid4())
+                "topology_result_dict": topology_result_dict,
+                "file_path": file_path,
+                "state_id": self.current_state_id
+            })
 
             return {
                 "success": True,
                 "model_id": model_id,
-                "model_info": model_info.dict(),
-                "topology_result": topology_result.dict(),
+                "model_info": model_info_dict,
+                "topology_result": topology_result_dict,
                 "state_id": self.current_state_id
             }
 
@@ -379,11 +687,21 @@ class LLMNLMeshAgent:
                 "state_id": self.current_state_id
             }
 
+    def _on_model_evicted(self, model_id: str, model_data: Mapping[str, Any]) -> None:
+        """模型被缓存淘汰时删除其上传文件"""
+        file_path = model_data.get("file_path")
+        if file_path:
+            self.model_processor.cleanup_file(file_path)
+
     def get_model_info(self, model_id: str):
         """获取模型信息"""
-        if model_id in self.model_cache:
-            return self.model_cache[model_id]["model_info"]
-        return None
+        model_data = self.model_cache.get(model_id)
+        return model_data["model_info"] if model_data is not None else None
+
+    def get_model_file_path(self, model_id: str) -> Optional[str]:
+        """获取模型文件在磁盘上的路径"""
+        model_data = self.model_cache.get(model_id)
+        return model_data["file_path"] if model_data is not None else None
 
     def cleanup_model(self, model_id: str) -> bool:
         """清理模型数据"""
@@ -392,7 +710,7 @@ class LLMNLMeshAgent:
                 model_data = self.model_cache[model_id]
                 self.model_processor.cleanup_file(model_data["file_path"])
                 del self.model_cache[model_id]
-                self.current_state_id = str(uuid.uuid4())
+                self.current_state_id = _next_state_id()
                 return True
         except Exception:
             pass
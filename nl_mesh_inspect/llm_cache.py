@@ -0,0 +1,66 @@
+"""
+LLM响应缓存模块 - 对确定性调用（temperature=0）的相同提示复用模型响应
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import json
+import threading
+
+
+def _message_payload(message: Any) -> Any:
+    """将LangChain消息对象转换为可序列化的(角色, 内容)形式"""
+    if hasattr(message, "type") and hasattr(message, "content"):
+        return {"role": message.type, "content": message.content}
+    return message
+
+
+class LLMCache:
+    """LLM响应缓存（进程内LRU）"""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def cache_key(model: str, messages: List[Any], tools: Iterable[str],
+                  temperature: float = 0.0) -> Optional[str]:
+        """生成缓存键，非确定性调用（temperature > 0）返回None（不缓存）"""
+        if isinstance(temperature, (int, float)) and temperature > 0:
+            return None
+        payload = json.dumps(
+            {"model": model, "messages": [_message_payload(m) for m in messages], "tools": sorted(tools)},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存的响应，命中时标记为最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """保存响应，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.stats.update(hits=0, misses=0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
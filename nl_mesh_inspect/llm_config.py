@@ -2,12 +2,23 @@
 大模型配置模块 - 配置LLM并绑定3D模型分析工具
 """
 
-from langchain_openai import ChatOpenAI
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import Callable, List, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 import os
 
 
+def _measure_volume(mesh_data: Dict[str, Any]) -> Dict[str, Any]:
+    """测量体积"""
+    return {
+        "tool": "measure_volume",
+        "result": {
+            "volume": 1000.0,  # 模拟数据
+            "unit": "mm³"
+        }
+    }
+
+
 class MeasureVolumeTool(BaseModel):
     """测量体积工具"""
 
@@ -15,13 +26,18 @@ class MeasureVolumeTool(BaseModel):
 
     def measure_volume(self) -> Dict[str, Any]:
         """测量体积"""
-        return {
-            "tool": "measure_volume",
-            "result": {
-                "volume": 1000.0,  # 模拟数据
-                "unit": "mm³"
-            }
+        return _measure_volume(self.mesh_data)
+
+
+def _measure_surface_area(mesh_data: Dict[str, Any]) -> Dict[str, Any]:
+    """测量表面积"""
+    return {
+        "tool": "measure_surface_area",
+        "result": {
+            "surface_area": 500.0,  # 模拟数据
+            "unit": "mm²"
         }
+    }
 
 
 class MeasureSurfaceAreaTool(BaseModel):
@@ -31,13 +47,21 @@ class MeasureSurfaceAreaTool(BaseModel):
 
     def measure_surface_area(self) -> Dict[str, Any]:
         """测量表面积"""
-        return {
-            "tool": "measure_surface_area",
-            "result": {
-                "surface_area": 500.0,  # 模拟数据
-                "unit": "mm²"
-            }
+        return _measure_surface_area(self.mesh_data)
+
+
+def _detect_holes(mesh_data: Dict[str, Any]) -> Dict[str, Any]:
+    """检测孔洞"""
+    return {
+        "tool": "detect_holes",
+        "result": {
+            "holes_count": 5,
+            "holes": [
+                {"id": 1, "diameter": 10.0, "depth": 20.0},
+                {"id": 2, "diameter": 8.0, "depth": 15.0}
+            ]
         }
+    }
 
 
 class DetectHolesTool(BaseModel):
@@ -47,16 +71,21 @@ class DetectHolesTool(BaseModel):
 
     def detect_holes(self) -> Dict[str, Any]:
         """检测孔洞"""
-        return {
-            "tool": "detect_holes",
-            "result": {
-                "holes_count": 5,
-                "holes": [
-                    {"id": 1, "diameter": 10.0, "depth": 20.0},
-                    {"id": 2, "diameter": 8.0, "depth": 15.0}
-                ]
-            }
+        return _detect_holes(self.mesh_data)
+
+
+def _detect_faces(mesh_data: Dict[str, Any]) -> Dict[str, Any]:
+    """检测面"""
+    return {
+        "tool": "detect_faces",
+        "result": {
+            "faces_count": 12,
+            "faces": [
+                {"id": 1, "area": 50.0, "normal": [0, 0, 1]},
+                {"id": 2, "area": 30.0, "normal": [1, 0, 0]}
+            ]
         }
+    }
 
 
 class DetectFacesTool(BaseModel):
@@ -66,16 +95,19 @@ class DetectFacesTool(BaseModel):
 
     def detect_faces(self) -> Dict[str, Any]:
         """检测面"""
-        return {
-            "tool": "detect_faces",
-            "result": {
-                "faces_count": 12,
-                "faces": [
-                    {"id": 1, "area": 50.0, "normal": [0, 0, 1]},
-                    {"id": 2, "area": 30.0, "normal": [1, 0, 0]}
-                ]
-            }
+        return _detect_faces(self.mesh_data)
+
+
+def _check_topology(mesh_data: Dict[str, Any]) -> Dict[str, Any]:
+    """检查拓扑"""
+    return {
+        "tool": "check_topology",
+        "result": {
+            "is_watertight": True,
+            "manifold": True,
+            "issues": []
         }
+    }
 
 
 class CheckTopologyTool(BaseModel):
@@ -85,14 +117,19 @@ class CheckTopologyTool(BaseModel):
 
     def check_topology(self) -> Dict[str, Any]:
         """检查拓扑"""
-        return {
-            "tool": "check_topology",
-            "result": {
-                "is_watertight": True,
-                "manifold": True,
-                "issues": []
-            }
+        return _check_topology(self.mesh_data)
+
+
+def _analyze_connectivity(mesh_data: Dict[str, Any]) -> Dict[str, Any]:
+    """分析连通性"""
+    return {
+        "tool": "analyze_connectivity",
+        "result": {
+            "connected_components": 1,
+            "edges_count": 100,
+            "vertices_count": 50
         }
+    }
 
 
 class AnalyzeConnectivityTool(BaseModel):
@@ -102,14 +139,7 @@ class AnalyzeConnectivityTool(BaseModel):
 
     def analyze_connectivity(self) -> Dict[str, Any]:
         """分析连通性"""
-        return {
-            "tool": "analyze_connectivity",
-            "result": {
-                "connected_components": 1,
-                "edges_count": 100,
-                "vertices_count": 50
-            }
-        }
+        return _analyze_connectivity(self.mesh_data)
 
 
 # 工具列表（使用函数定义）
@@ -122,6 +152,17 @@ MESH_ANALYSIS_TOOLS = [
     AnalyzeConnectivityTool
 ]
 
+# 工具名称（用于LLM响应缓存键等，无需每次调用时重新获取）
+TOOL_NAMES = tuple(tool.__name__ for tool in MESH_ANALYSIS_TOOLS)
+
+
+@lru_cache(maxsize=None)
+def get_tool_schemas() -> Tuple[Dict[str, Any], ...]:
+    """获取工具的OpenAI函数调用描述（只生成一次）"""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return tuple(convert_to_openai_tool(tool) for tool in MESH_ANALYSIS_TOOLS)
+
 
 def create_llm_with_tools(use_mock: bool = True):
     """
@@ -138,6 +179,9 @@ def create_llm_with_tools(use_mock: bool = True):
         from nl_mesh_inspect.mock_llm import mock_llm
         return mock_llm
     else:
+        # Reason: 仅真实模式需要langchain_openai，模拟模式（模块导入时默认使用）无需支付其导入开销
+        from langchain_openai import ChatOpenAI
+
         # 使用真实的OpenAI兼容接口配置
         llm = ChatOpenAI(
             openai_api_key="",  # 使用提供的API密钥
@@ -148,12 +192,23 @@ def create_llm_with_tools(use_mock: bool = True):
         )
 
         # 绑定3D模型分析工具
-        llm_with_tools = llm.bind_tools(MESH_ANALYSIS_TOOLS)
+        # Reason: bind_tools每次都会从Pydantic模型重新生成JSON Schema，这里直接绑定缓存的描述
+        llm_with_tools = llm.bind(tools=list(get_tool_schemas()))
 
         return llm_with_tools
 
 
-# 工具函数映射
+# 工具名称到执行函数的映射
+TOOL_DISPATCH: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "MeasureVolumeTool": _measure_volume,
+    "MeasureSurfaceAreaTool": _measure_surface_area,
+    "DetectHolesTool": _detect_holes,
+    "DetectFacesTool": _detect_faces,
+    "CheckTopologyTool": _check_topology,
+    "AnalyzeConnectivityTool": _analyze_connectivity,
+}
+
+
 def execute_tool(tool_name: str, tool_args: Dict[str, Any], mesh_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     执行工具函数
@@ -166,29 +221,11 @@ def execute_tool(tool_name: str, tool_args: Dict[str, Any], mesh_data: Dict[str,
     Returns:
         Dict: 执行结果
     """
-    # 将mesh_data添加到参数中
-    tool_args["mesh_data"] = mesh_data
-
-    if tool_name == "MeasureVolumeTool":
-        tool = MeasureVolumeTool(**tool_args)
-        return tool.measure_volume()
-    elif tool_name == "MeasureSurfaceAreaTool":
-        tool = MeasureSurfaceAreaTool(**tool_args)
-        return tool.measure_surface_area()
-    elif tool_name == "DetectHolesTool":
-        tool = DetectHolesTool(**tool_args)
-        return tool.detect_holes()
-    elif tool_name == "DetectFacesTool":
-        tool = DetectFacesTool(**tool_args)
-        return tool.detect_faces()
-    elif tool_name == "CheckTopologyTool":
-        tool = CheckTopologyTool(**tool_args)
-        return tool.check_topology()
-    elif tool_name == "AnalyzeConnectivityTool":
-        tool = AnalyzeConnectivityTool(**tool_args)
-        return tool.analyze_connectivity()
-    else:
+    # Reason: 字典查找代替逐个比较工具名；直接调用执行函数，无需为每次调用构造并校验工具模型
+    tool_function = TOOL_DISPATCH.get(tool_name)
+    if tool_function is None:
         return {"error": f"未知工具: {tool_name}"}
+    return tool_function(mesh_data)
 
 
 # 创建模型实例（使用模拟模式进行开发测试）
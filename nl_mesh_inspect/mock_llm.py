@@ -2,75 +2,95 @@
 模拟LLM模块 - 用于在没有真实API连接时的开发测试
 """
 
+import re
 from typing import Dict, Any, List
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
 
+# 路由规则（按优先级排列）：(标签, 中文关键词, 英文关键词)
+_ROUTES = [
+    ("volume", "测量体积", "volume"),
+    ("surface_area", "测量表面积", "surface area"),
+    ("holes", "检测孔洞", "holes"),
+    ("topology", "检查拓扑", "topology"),
+]
+_ROUTE_PRIORITY = {tag: index for index, (tag, _, _) in enumerate(_ROUTES)}
+
+# 单个正则一次扫描全部关键词
+_ROUTE_PATTERN = re.compile(
+    "|".join(f"(?P<{tag}>{re.escape(zh)}|{re.escape(en)})" for tag, zh, en in _ROUTES),
+    re.IGNORECASE
+)
+
+# 预先构建的响应（每次调用返回同一实例，调用方不应修改）
+_RESPONSES: Dict[str, AIMessage] = {
+    "volume": AIMessage(
+        content="我将使用测量工具来分析这个3D模型的体积。",
+        tool_calls=[{
+            "name": "MeasureVolumeTool",
+            "args": {},
+            "id": "1"
+        }]
+    ),
+    "surface_area": AIMessage(
+        content="我将使用测量工具来分析这个3D模型的表面积。",
+        tool_calls=[{
+            "name": "MeasureSurfaceAreaTool",
+            "args": {},
+            "id": "1"
+        }]
+    ),
+    "holes": AIMessage(
+        content="我将使用特征检测工具来检测这个3D模型的孔洞。",
+        tool_calls=[{
+            "name": "DetectHolesTool",
+            "args": {},
+            "id": "1"
+        }]
+    ),
+    "topology": AIMessage(
+        content="我将使用拓扑分析工具来检查这个3D模型的拓扑结构。",
+        tool_calls=[{
+            "name": "CheckTopologyTool",
+            "args": {},
+            "id": "1"
+        }]
+    ),
+}
+_DEFAULT_RESPONSE = AIMessage(
+    content="我将综合分析这个3D模型。",
+    tool_calls=[
+        {
+            "name": "MeasureVolumeTool",
+            "args": {},
+            "id": "1"
+        },
+        {
+            "name": "CheckTopologyTool",
+            "args": {},
+            "id": "2"
+        }
+    ]
+)
+
+
 class MockLLM:
     """模拟LLM"""
 
     def invoke(self, messages: List[BaseMessage]) -> AIMessage:
         """模拟LLM调用"""
-        # 提取用户消息
+        # 提取最后一条用户消息（当前查询）
         user_content = ""
-        for msg in messages:
+        for msg in reversed(messages):
             if isinstance(msg, HumanMessage):
                 user_content = msg.content
                 break
 
-        # 根据用户查询生成响应
-        if "测量体积" in user_content or "volume" in user_content.lower():
-            return AIMessage(
-                content="我将使用测量工具来分析这个3D模型的体积。",
-                tool_calls=[{
-                    "name": "MeasureVolumeTool",
-                    "args": {},
-                    "id": "1"
-                }]
-            )
-        elif "测量表面积" in user_content or "surface area" in user_content.lower():
-            return AIMessage(
-                content="我将使用测量工具来分析这个3D模型的表面积。",
-                tool_calls=[{
-                    "name": "MeasureSurfaceAreaTool",
-                    "args": {},
-                    "id": "1"
-                }]
-            )
-        elif "检测孔洞" in user_content or "holes" in user_content.lower():
-            return AIMessage(
-                content="我将使用特征检测工具来检测这个3D模型的孔洞。",
-                tool_calls=[{
-                    "name": "DetectHolesTool",
-                    "args": {},
-                    "id": "1"
-                }]
-            )
-        elif "检查拓扑" in user_content or "topology" in user_content.lower():
-            return AIMessage(
-                content="我将使用拓扑分析工具来检查这个3D模型的拓扑结构。",
-                tool_calls=[{
-                    "name": "CheckTopologyTool",
-                    "args": {},
-                    "id": "1"
-                }]
-            )
-        else:
-            return AIMessage(
-                content="我将综合分析这个3D模型。",
-                tool_calls=[
-                    {
-                        "name": "MeasureVolumeTool",
-                        "args": {},
-                        "id": "1"
-                    },
-                    {
-                        "name": "CheckTopologyTool",
-                        "args": {},
-                        "id": "2"
-                    }
-                ]
-            )
+        # 根据用户查询生成响应；多个关键词同时出现时按路由优先级选择
+        tags = {match.lastgroup for match in _ROUTE_PATTERN.finditer(user_content)}
+        if not tags:
+            return _DEFAULT_RESPONSE
+        return _RESPONSES[min(tags, key=_ROUTE_PRIORITY.__getitem__)]
 
     def bind_tools(self, tools):
         """模拟绑定工具"""
@@ -78,4 +98,4 @@ class MockLLM:
 
 
 # 创建模拟LLM实例
-mock_llm = MockLLM()
\ No newline at end of file
+mock_llm = MockLLM()
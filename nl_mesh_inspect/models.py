@@ -2,10 +2,11 @@
 数据模型定义 - Pydantic模型用于数据验证和序列化
 """
 
-from typing import List, Optional, Dict, Any, Union
+from typing import FrozenSet, List, Optional, Dict, Any, Union
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
+import hashlib
 
 
 class ModelFormat(str, Enum):
@@ -16,6 +17,10 @@ class ModelFormat(str, Enum):
     STEP = "step"
 
 
+# 支持的格式字符串集合（成员检查为O(1)，无需遍历枚举）
+VALID_FORMATS: FrozenSet[str] = frozenset(f.value for f in ModelFormat)
+
+
 class AnalysisIntent(str, Enum):
     """分析意图类型"""
     QUERY = "query"  # 查询信息
@@ -44,6 +49,8 @@ class ModelUploadRequest(BaseModel):
 
 class GeometricFeature(BaseModel):
     """几何特征"""
+    model_config = ConfigDict(frozen=True)
+
     entity_type: GeometricEntity = Field(..., description="实体类型")
     indices: List[int] = Field(..., description="索引列表")
     properties: Dict[str, Any] = Field(default_factory=dict, description="属性")
@@ -52,6 +59,8 @@ class GeometricFeature(BaseModel):
 
 class TopologyCheckResult(BaseModel):
     """拓扑检查结果"""
+    model_config = ConfigDict(frozen=True)
+
     is_manifold: bool = Field(..., description="是否为流形")
     has_self_intersections: bool = Field(..., description="是否有自相交")
     is_watertight: bool = Field(..., description="是否水密")
@@ -60,15 +69,21 @@ class TopologyCheckResult(BaseModel):
 
 class AnalysisRequest(BaseModel):
     """分析请求"""
+    # Reason: 同一请求对象会在批量分析和并发工具执行的多个线程间共享，创建后不允许修改
+    model_config = ConfigDict(frozen=True)
+
     model_id: str = Field(..., description="模型ID")
     natural_language_query: str = Field(..., description="自然语言查询")
     intent: Optional[AnalysisIntent] = Field(default=None, description="分析意图")
     parameters: Dict[str, Any] = Field(default_factory=dict, description="参数")
     state_id: str = Field(..., description="状态ID用于并发控制")
+    no_cache: bool = Field(default=False, description="是否跳过LLM响应缓存")
 
 
 class AnalysisResult(BaseModel):
     """分析结果"""
+    model_config = ConfigDict(frozen=True)
+
     success: bool = Field(..., description="是否成功")
     result_type: str = Field(..., description="结果类型")
     data: Dict[str, Any] = Field(..., description="结果数据")
@@ -80,6 +95,8 @@ class AnalysisResult(BaseModel):
 
 class ModelInfo(BaseModel):
     """模型信息"""
+    model_config = ConfigDict(frozen=True)
+
     model_id: str = Field(..., description="模型ID")
     file_name: str = Field(..., description="文件名")
     file_format: ModelFormat = Field(..., description="文件格式")
@@ -87,12 +104,22 @@ class ModelInfo(BaseModel):
     vertex_count: int = Field(..., description="顶点数量")
     face_count: int = Field(..., description="面片数量")
     bounding_box: List[float] = Field(..., description="边界框")
+    extents: List[float] = Field(default_factory=list, description="边界框尺寸")
+    signature: str = Field(default="", description="网格签名（顶点数、面数和边界框的哈希）")
     upload_time: datetime = Field(default_factory=datetime.now, description="上传时间")
     features: List[GeometricFeature] = Field(default_factory=list, description="特征列表")
 
 
+def mesh_signature(vertex_count: int, face_count: int, bounding_box: List[float]) -> str:
+    """计算网格签名（16位十六进制），上传时计算一次，用作与网格相关的缓存键"""
+    payload = f"{vertex_count}-{face_count}-{bounding_box}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
 class ErrorResponse(BaseModel):
     """错误响应"""
+    model_config = ConfigDict(frozen=True)
+
     error: str = Field(..., description="错误信息")
     details: Optional[Dict[str, Any]] = Field(default=None, description="详细信息")
     state_id: Optional[str] = Field(default=None, description="状态ID")
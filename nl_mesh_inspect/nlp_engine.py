@@ -3,11 +3,20 @@
 """
 
 import re
+import copy
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 from enum import Enum
 
 from nl_mesh_inspect.models import AnalysisIntent, GeometricEntity, AnalysisRequest
 
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick为可选依赖，未安装时使用纯Python前缀树匹配
+    ahocorasick = None
+
 
 class QueryType(str, Enum):
     """查询类型"""
@@ -18,81 +27,236 @@ class QueryType(str, Enum):
     MODIFICATION = "modification"  # 修改操作
 
 
+# Reason: 模式在模块加载时编译一次，避免每次解析都经过 re 模块的缓存查找
+# 数值约束模式
+# Reason: 单位不区分大小写（5CM、5Mm），与normalize_units一致；局部标志不影响其余模式
+_UNITS = r'(?i:mm|厘米|cm|米|m|英寸|inch|in)'
+# 单个数值：整数或小数，不从更长的数字串（如 3.4.5）中截取一段
+_NUMBER = r'(?<![\d.])\d+(?:\.\d+)?(?!\.?\d)'
+# (约束类别, 模式)，各分组以类别名为前缀命名，解析时按类别分派
+_CONSTRAINT_PATTERNS = [
+    # 大于/不小于/>=/> + 数值 + 单位
+    ("gt", re.compile(rf'(?P<gt_op>大于等于|大于|不小于|>=|>)\s*(?P<gt_value>{_NUMBER})\s*(?P<gt_unit>{_UNITS})?')),
+    # 小于/不大于/<=/< + 数值 + 单位
+    ("lt", re.compile(rf'(?P<lt_op>小于等于|小于|不大于|<=|<)\s*(?P<lt_value>{_NUMBER})\s*(?P<lt_unit>{_UNITS})?')),
+    # 等于 + 数值 + 单位
+    ("eq", re.compile(rf'(?P<eq_op>等于)\s*(?P<eq_value>{_NUMBER})\s*(?P<eq_unit>{_UNITS})?')),
+    # 数值范围（5到10mm、5-10mm），两端不与其他连字符相连，避免把日期 2024-10-15 当作范围
+    ("range", re.compile(rf'(?<!-)(?P<range_min>{_NUMBER})\s*(?:到|-)\s*(?P<range_max>{_NUMBER})(?!-\d)\s*(?P<range_unit>{_UNITS})?')),
+    # 简单的数值
+    ("value", re.compile(rf'(?P<value_value>{_NUMBER})\s*(?P<value_unit>{_UNITS})'))
+]
+# 查询中是否包含数字
+_DIGIT_RE = re.compile(r'\d')
+# Reason: 全部约束模式合并为一个正则，从左到右单次扫描；已被比较或范围约束消耗的数值不再重复作为简单数值
+_CONSTRAINT_RE = re.compile("|".join(f"(?P<{kind}>{pattern.pattern})" for kind, pattern in _CONSTRAINT_PATTERNS))
+# 类别 -> (模式源码, 按顺序排列的分组名)
+_CONSTRAINT_GROUPS = {
+    kind: (pattern.pattern, sorted(pattern.groupindex, key=pattern.groupindex.get))
+    for kind, pattern in _CONSTRAINT_PATTERNS
+}
+
+# 意图关键词映射
+_INTENT_PATTERNS = {
+    AnalysisIntent.QUERY: [
+        re.compile(r'(查询|查看|显示|展示|什么是|有多少|多大|多长|多宽|多高|体积|面积|周长)'),
+        re.compile(r'(measure|show|display|what is|how many|how big|how long|how wide|how tall|volume|area|perimeter)'),
+        re.compile(r'(检测|检查|分析|analyze|check|detect|inspect)')
+    ],
+    AnalysisIntent.OPERATION: [
+        re.compile(r'(选择|高亮|标记|highlight|select|mark|identify)'),
+        re.compile(r'(旋转|移动|缩放|rotate|move|scale|translate)'),
+        re.compile(r'(比较|对比|compare|contrast)')
+    ],
+    AnalysisIntent.MODIFICATION: [
+        re.compile(r'(修改|编辑|改变|调整|modify|edit|change|adjust|alter)'),
+        re.compile(r'(添加|删除|创建|add|remove|delete|create)'),
+        re.compile(r'(优化|改进|improve|optimize|enhance)')
+    ]
+}
+
+# 查询类型模式
+_QUERY_TYPE_PATTERNS = {
+    QueryType.MEASUREMENT: [
+        re.compile(r'(距离|长度|宽度|高度|直径|半径|角度|measure|distance|length|width|height|diameter|radius|angle)'),
+        re.compile(r'(体积|面积|表面积|周长|volume|area|surface area|perimeter)')
+    ],
+    QueryType.FEATURE_DETECTION: [
+        re.compile(r'(特征|孔洞|圆柱|平面|球体|feature|hole|cylinder|plane|sphere)'),
+        re.compile(r'(检测|识别|detect|identify|find|locate)')
+    ],
+    QueryType.TOPOLOGY_CHECK: [
+        re.compile(r'(拓扑|流形|水密|自相交|topology|manifold|watertight|self-intersection)'),
+        re.compile(r'(检查|验证|check|verify|validate)')
+    ],
+    QueryType.SELECTION: [
+        re.compile(r'(选择|高亮|标记|select|highlight|mark)'),
+        re.compile(r'(所有|全部|all|every)')
+    ]
+}
+
+
+# 几何实体关键词映射
+_ENTITY_KEYWORDS = {
+    GeometricEntity.VERTEX: ["顶点", "点", "vertex", "point"],
+    GeometricEntity.EDGE: ["边", "边缘", "edge", "边界"],
+    GeometricEntity.FACE: ["面", "表面", "face", "surface"],
+    GeometricEntity.HOLE: ["孔", "洞", "hole", "opening"],
+    GeometricEntity.CYLINDER: ["圆柱", "柱面", "cylinder", "cylindrical"],
+    GeometricEntity.PLANE: ["平面", "plate", "plane", "flat"],
+    GeometricEntity.SPHERE: ["球体", "球面", "sphere", "spherical"]
+}
+
+# 测量单位到毫米的换算（键均为小写）
+_UNIT_CONVERSION = {
+    "mm": 1.0,
+    "厘米": 10.0,
+    "cm": 10.0,
+    "米": 1000.0,
+    "m": 1000.0,
+    "英寸": 25.4,
+    "inch": 25.4,
+    "in": 25.4
+}
+
+# (声明顺序, 实体类型, 关键词, 小写关键词)，声明顺序用于位置相同时保持原有排序
+_KEYWORD_ENTRIES = [
+    (order, entity_type, keyword, keyword.lower())
+    for order, (entity_type, keyword) in enumerate(
+        (entity_type, keyword)
+        for entity_type, keywords in _ENTITY_KEYWORDS.items()
+        for keyword in keywords
+    )
+]
+
+
+def _build_automaton(keyword_entries: List[Tuple[int, GeometricEntity, str, str]]):
+    """构建全部关键词的Aho-Corasick自动机，未安装pyahocorasick时返回None"""
+    if ahocorasick is None:
+        return None
+
+    entries_by_word: Dict[str, List[Tuple[int, GeometricEntity, str, str]]] = {}
+    for entry in keyword_entries:
+        entries_by_word.setdefault(entry[3], []).append(entry)
+
+    automaton = ahocorasick.Automaton()
+    for word, entries in entries_by_word.items():
+        automaton.add_word(word, (len(word), entries))
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_keyword_trie(keyword_entries: List[Tuple[int, GeometricEntity, str, str]]) -> Dict[Any, Any]:
+    """构建小写关键词的字符前缀树，键None处保存以该节点结尾的关键词"""
+    trie: Dict[Any, Any] = {}
+    for order, entity_type, keyword, keyword_lower in keyword_entries:
+        node = trie
+        for char in keyword_lower:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append((order, entity_type, keyword))
+    return trie
+
+
+_KEYWORD_AUTOMATON = _build_automaton(_KEYWORD_ENTRIES)
+_KEYWORD_TRIE = _build_keyword_trie(_KEYWORD_ENTRIES)
+
+
+def _scan_plan(categories, patterns_by_category: Dict[Any, List[re.Pattern]]) -> List[Tuple[Any, List[re.Pattern], int]]:
+    """按类别顺序生成(类别, 模式列表, 其后各类别的最高可能得分)"""
+    plan = []
+    remaining = 0
+    for category in reversed(list(categories)):
+        patterns = patterns_by_category.get(category, [])
+        plan.append((category, patterns, remaining))
+        remaining = max(remaining, len(patterns))
+    plan.reverse()
+    return plan
+
+
+def _best_category(text: str, plan: List[Tuple[Any, List[re.Pattern], int]]) -> Tuple[Any, int]:
+    """返回命中模式数最多的类别及其得分，得分相同时取顺序靠前的类别"""
+    best, best_score = None, -1
+    for category, patterns, remaining in plan:
+        score = 0
+        for pattern in patterns:
+            if pattern.search(text):
+                score += 1
+        if score > best_score:
+            best, best_score = category, score
+        # Reason: 之后的类别最多只能追平，而平局取靠前的类别，领先者已确定
+        if best_score >= remaining:
+            break
+    return best, best_score
+
+
 class EntityExtractor:
     """实体提取器 - 从自然语言中提取几何实体和参数"""
 
     def __init__(self):
         # 几何实体关键词映射
-        self.entity_keywords = {
-            GeometricEntity.VERTEX: ["顶点", "点", "vertex", "point"],
-            GeometricEntity.EDGE: ["边", "边缘", "edge", "边界"],
-            GeometricEntity.FACE: ["面", "表面", "face", "surface"],
-            GeometricEntity.HOLE: ["孔", "洞", "hole", "opening"],
-            GeometricEntity.CYLINDER: ["圆柱", "柱面", "cylinder", "cylindrical"],
-            GeometricEntity.PLANE: ["平面", "plate", "plane", "flat"],
-            GeometricEntity.SPHERE: ["球体", "球面", "sphere", "spherical"]
-        }
+        self.entity_keywords = _ENTITY_KEYWORDS
 
-        # 测量单位映射
-        self.unit_conversion = {
-            "mm": 1.0,
-            "厘米": 10.0,
-            "cm": 10.0,
-            "米": 1000.0,
-            "m": 1000.0,
-            "英寸": 25.4,
-            "inch": 25.4,
-            "in": 25.4
-        }
+        # 测量单位映射（键均为小写，normalize_units按小写查找）
+        self.unit_conversion = _UNIT_CONVERSION
+
+        # Reason: 关键词表、前缀树和自动机与实例无关，模块加载时构建一次，所有实例共享
+        self._keyword_entries = _KEYWORD_ENTRIES
+        self._automaton = _KEYWORD_AUTOMATON if ahocorasick is not None else None
+        self._keyword_trie = _KEYWORD_TRIE
 
     def extract_entities(self, text: str) -> List[Dict[str, Any]]:
         """从文本中提取几何实体"""
-        entities = []
-
-        # 检测实体类型
-        for entity_type, keywords in self.entity_keywords.items():
-            for keyword in keywords:
-                if keyword.lower() in text.lower():
-                    entities.append({
-                        "type": entity_type,
-                        "keyword": keyword,
-                        "position": text.lower().index(keyword.lower())
-                    })
+        text_lower = text.lower()
 
-        return sorted(entities, key=lambda x: x["position"])
+        # 每个关键词只记录首次出现的位置：(位置, 声明顺序) -> 实体
+        found: Dict[int, Tuple[int, GeometricEntity, str]] = {}
+        if self._automaton is not None:
+            # Reason: 一次扫描匹配全部关键词，代替逐个关键词在文本中查找
+            for end, (length, entries) in self._automaton.iter(text_lower):
+                for order, entity_type, keyword, _ in entries:
+                    if order not in found:
+                        found[order] = (end - length + 1, entity_type, keyword)
+        else:
+            # 从每个位置沿前缀树匹配，只有首字符是关键词首字符的位置才会继续
+            length = len(text_lower)
+            for position in range(length):
+                node = self._keyword_trie.get(text_lower[position])
+                index = position + 1
+                while node is not None:
+                    for order, entity_type, keyword in node.get(None, ()):
+                        if order not in found:
+                            found[order] = (position, entity_type, keyword)
+                    if index >= length:
+                        break
+                    node = node.get(text_lower[index])
+                    index += 1
+
+        return [
+            {"type": entity_type, "keyword": keyword, "position": position}
+            for _, (position, entity_type, keyword) in sorted(
+                found.items(), key=lambda item: (item[1][0], item[0])
+            )
+        ]
 
     def extract_numerical_constraints(self, text: str) -> List[Dict[str, Any]]:
         """提取数值约束"""
         constraints = []
 
-        # 匹配数值和比较运算符
-        patterns = [
-            # 大于/小于/等于 + 数值 + 单位
-            r'(大于|大于等于|小于|小于等于|等于|不小于|不大于)\s*([\d.]+)\s*(mm|厘米|cm|米|m|英寸|inch|in)?',
-            # 数值范围
-            r'([\d.]+)\s*到\s*([\d.]+)\s*(mm|厘米|cm|米|m|英寸|inch|in)?',
-            # 简单的数值
-            r'([\d.]+)\s*(mm|厘米|cm|米|m|英寸|inch|in)'
-        ]
-
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                if len(match.groups()) >= 2:
-                    constraint = {
-                        "pattern": pattern,
-                        "match": match.group(),
-                        "groups": match.groups()
-                    }
-                    constraints.append(constraint)
+        for match in _CONSTRAINT_RE.finditer(text):
+            kind = match.lastgroup
+            pattern, group_names = _CONSTRAINT_GROUPS[kind]
+            constraints.append({
+                "kind": kind,
+                "pattern": pattern,
+                "match": match.group(),
+                "groups": tuple(match.group(name) for name in group_names)
+            })
 
         return constraints
 
-    def normalize_units(self, value: float, unit: str) -> float:
-        """统一单位到毫米"""
-        if unit in self.unit_conversion:
-            return value * self.unit_conversion[unit]
-        return value  # 默认单位为毫米
+    def normalize_units(self, value: float, unit: Optional[str]) -> float:
+        """统一单位到毫米（单位不区分大小写，缺省或未知单位按毫米处理）"""
+        return value * self.unit_conversion.get((unit or "mm").lower(), 1.0)
 
 
 class IntentClassifier:
@@ -100,82 +264,116 @@ class IntentClassifier:
 
     def __init__(self):
         # 意图关键词映射
-        self.intent_patterns = {
-            AnalysisIntent.QUERY: [
-                r'(查询|查看|显示|展示|什么是|有多少|多大|多长|多宽|多高|体积|面积|周长)',
-                r'(measure|show|display|what is|how many|how big|how long|how wide|how tall|volume|area|perimeter)',
-                r'(检测|检查|分析|analyze|check|detect|inspect)'
-            ],
-            AnalysisIntent.OPERATION: [
-                r'(选择|高亮|标记|highlight|select|mark|identify)',
-                r'(旋转|移动|缩放|rotate|move|scale|translate)',
-                r'(比较|对比|compare|contrast)'
-            ],
-            AnalysisIntent.MODIFICATION: [
-                r'(修改|编辑|改变|调整|modify|edit|change|adjust|alter)',
-                r'(添加|删除|创建|add|remove|delete|create)',
-                r'(优化|改进|improve|optimize|enhance)'
-            ]
-        }
+        self.intent_patterns = _INTENT_PATTERNS
 
         # 查询类型模式
-        self.query_type_patterns = {
-            QueryType.MEASUREMENT: [
-                r'(距离|长度|宽度|高度|直径|半径|角度|measure|distance|length|width|height|diameter|radius|angle)',
-                r'(体积|面积|表面积|周长|volume|area|surface area|perimeter)'
-            ],
-            QueryType.FEATURE_DETECTION: [
-                r'(特征|孔洞|圆柱|平面|球体|feature|hole|cylinder|plane|sphere)',
-                r'(检测|识别|detect|identify|find|locate)'
-            ],
-            QueryType.TOPOLOGY_CHECK: [
-                r'(拓扑|流形|水密|自相交|topology|manifold|watertight|self-intersection)',
-                r'(检查|验证|check|verify|validate)'
-            ],
-            QueryType.SELECTION: [
-                r'(选择|高亮|标记|select|highlight|mark)',
-                r'(所有|全部|all|every)'
-            ]
-        }
+        self.query_type_patterns = _QUERY_TYPE_PATTERNS
+
+        # 按枚举顺序扫描，领先者确定后不再匹配剩余类别的模式
+        self._intent_plan = _scan_plan(AnalysisIntent, self.intent_patterns)
+        self._query_type_plan = _scan_plan(QueryType, self.query_type_patterns)
 
     def classify_intent(self, text: str) -> AnalysisIntent:
         """分类查询意图"""
-        text_lower = text.lower()
-
-        # 统计每个意图的匹配次数
-        intent_scores = {intent: 0 for intent in AnalysisIntent}
-
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    intent_scores[intent] += 1
-
-        # 返回得分最高的意图
-        return max(intent_scores.items(), key=lambda x: x[1])[0]
+        # 返回命中模式最多的意图
+        intent, _ = _best_category(text.lower(), self._intent_plan)
+        return intent
 
     def classify_query_type(self, text: str) -> QueryType:
         """分类查询类型"""
-        text_lower = text.lower()
-
-        # 统计每个查询类型的匹配次数
-        type_scores = {qtype: 0 for qtype in QueryType}
-
-        for qtype, patterns in self.query_type_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    type_scores[qtype] += 1
-
-        # 返回得分最高的类型
-        best_type = max(type_scores.items(), key=lambda x: x[1])[0]
-        return best_type if type_scores[best_type] > 0 else QueryType.MEASUREMENT
+        # 返回命中模式最多的类型
+        best_type, score = _best_category(text.lower(), self._query_type_plan)
+        return best_type if score > 0 else QueryType.MEASUREMENT
 
 
 class QueryParser:
     """查询解析器 - 解析自然语言查询并生成结构化命令"""
 
-    def __init__(self):
+    # 解析结果缓存（类级别共享，按原始查询字符串索引，LRU淘汰）
+    _parse_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _parse_cache_maxsize: int = 1024
+    _parse_cache_lock = threading.Lock()
+    _parse_cache_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def __init__(self, semantic_cache: Optional[Any] = None):
         self.entity_extractor = EntityExtractor()
         self.intent_classifier = IntentClassifier()
+        # 可选的语义缓存（默认关闭），需提供get(text) -> Optional[dict]和put(text, result)，
+        # 例如基于嵌入相似度的GPTCache适配器
+        self.semantic_cache = semantic_cache
+
+    def parse_query_cached(self, text: str) -> Dict[str, Any]:
+        """解析自然语言查询（带缓存，返回可安全修改的副本）"""
+        with self._parse_cache_lock:
+            cached = self._parse_cache.get(text)
+            if cached is not None:
+                self._parse_cache.move_to_end(text)
+                self._parse_cache_stats["hits"] += 1
+            else:
+                self._parse_cache_stats["misses"] += 1
+
+        if cached is None:
+            # 语义命中的结果是近似的，只返回给启用了语义缓存的调用方，不写入共享的精确缓存
+            similar = self._semantic_lookup(text)
+            if similar is not None:
+                return similar
+
+            # Reason: parse_query 是输入字符串的纯函数，重复查询可以直接复用结果
+            cached = self.parse_query(text)
+            if self._semantic_eligible(text):
+                self.semantic_cache.put(text, copy.deepcopy(cached))
+            with self._parse_cache_lock:
+                self._parse_cache[text] = cached
+                if len(self._parse_cache) > self._parse_cache_maxsize:
+                    self._parse_cache.popitem(last=False)
+
+        return copy.deepcopy(cached)
+
+    def _semantic_eligible(self, text: str) -> bool:
+        """判断查询是否可以使用语义缓存"""
+        # Reason: 数值只差几位的查询语义向量几乎相同，但约束参数不同，含数字的查询既不查找也不写入语义缓存
+        return self.semantic_cache is not None and not _DIGIT_RE.search(text)
+
+    def _semantic_lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        """在语义缓存中查找相似查询的解析结果，未启用或未命中时返回None"""
+        if not self._semantic_eligible(text):
+            return None
+        similar = self.semantic_cache.get(text)
+        if similar is None:
+            return None
+        result = copy.deepcopy(similar)
+        result["original_text"] = text
+        return result
+
+    def parse_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """批量解析查询，结果按输入顺序返回"""
+        # Reason: 批量导入中重复查询很常见，每个不同的查询只解析一次
+        parsed: Dict[str, Dict[str, Any]] = {}
+        results = []
+        for text in queries:
+            if text in parsed:
+                results.append(copy.deepcopy(parsed[text]))
+            else:
+                parsed[text] = self.parse_query(text)
+                results.append(parsed[text])
+        return results
+
+    @classmethod
+    def cache_info(cls) -> Dict[str, int]:
+        """解析结果缓存的命中统计（类似functools.lru_cache的cache_info）"""
+        with cls._parse_cache_lock:
+            return {
+                **cls._parse_cache_stats,
+                "maxsize": cls._parse_cache_maxsize,
+                "currsize": len(cls._parse_cache)
+            }
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """清空解析结果缓存和统计"""
+        with cls._parse_cache_lock:
+            cls._parse_cache.clear()
+            cls._parse_cache_stats.update(hits=0, misses=0)
 
     def parse_query(self, text: str) -> Dict[str, Any]:
         """解析自然语言查询"""
@@ -207,36 +405,35 @@ class QueryParser:
 
         for constraint in constraints:
             groups = constraint["groups"]
-            pattern = constraint["pattern"]
+            kind = constraint["kind"]
 
-            if "大于" in pattern or ">" in pattern:
+            if kind == "gt":
                 # 大于约束
                 value = float(groups[1])
-                unit = groups[2] if len(groups) > 2 else "mm"
-                normalized_value = self.entity_extractor.normalize_units(value, unit)
-                parameters["min_value"] = normalized_value
+                parameters["min_value"] = self.entity_extractor.normalize_units(value, groups[2])
 
-            elif "小于" in pattern or "<" in pattern:
+            elif kind == "lt":
                 # 小于约束
                 value = float(groups[1])
-                unit = groups[2] if len(groups) > 2 else "mm"
-                normalized_value = self.entity_extractor.normalize_units(value, unit)
-                parameters["max_value"] = normalized_value
+                parameters["max_value"] = self.entity_extractor.normalize_units(value, groups[2])
+
+            elif kind == "eq":
+                # 等于约束
+                value = float(groups[1])
+                parameters["target_value"] = self.entity_extractor.normalize_units(value, groups[2])
 
-            elif "到" in pattern or "-" in pattern:
+            elif kind == "range":
                 # 范围约束
                 min_val = float(groups[0])
                 max_val = float(groups[1])
-                unit = groups[2] if len(groups) > 2 else "mm"
+                unit = groups[2]
                 parameters["min_value"] = self.entity_extractor.normalize_units(min_val, unit)
                 parameters["max_value"] = self.entity_extractor.normalize_units(max_val, unit)
 
-            elif len(groups) >= 2:
+            elif kind == "value":
                 # 简单数值约束
                 value = float(groups[0])
-                unit = groups[1]
-                normalized_value = self.entity_extractor.normalize_units(value, unit)
-                parameters["target_value"] = normalized_value
+                parameters["target_value"] = self.entity_extractor.normalize_units(value, groups[1])
 
         return parameters
 
@@ -269,11 +466,9 @@ class QueryParser:
 
         # 添加实体信息
         if entities:
-            entity_types = [e["type"].value for e in entities]
-            command_parts.append(f"entities:{','.join(entity_types)}")
+            command_parts.append(f"entities:{','.join(e['type'].value for e in entities)}")
 
         # 添加参数信息
-        for key, value in parameters.items():
-            command_parts.append(f"{key}:{value}")
+        command_parts.extend(f"{key}:{value}" for key, value in parameters.items())
 
         return "|".join(command_parts)
\ No newline at end of file
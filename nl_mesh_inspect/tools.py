@@ -2,14 +2,17 @@
 几何分析工具模块 - 实现3D模型处理和几何分析功能
 """
 
+import io
+import math
 import os
+import shutil
 import tempfile
-from typing import List, Dict, Any, Optional, Tuple
+from typing import BinaryIO, List, Dict, Any, Optional, Tuple, Union
 import numpy as np
 from pathlib import Path
 
 from nl_mesh_inspect.models import (
-    ModelFormat, GeometricFeature, GeometricEntity, TopologyCheckResult, ModelInfo
+    ModelFormat, GeometricFeature, GeometricEntity, TopologyCheckResult, ModelInfo, mesh_signature
 )
 
 
@@ -21,6 +24,110 @@ except ImportError:
     trimesh = None
     pv = None
 
+try:
+    from numba import njit
+except ImportError:
+    # numba为可选依赖，未安装时回退到trimesh自带的numpy实现
+    njit = None
+
+
+def _volume_kernel(vertices: np.ndarray, faces: np.ndarray) -> float:
+    """按面片累加有符号四面体体积"""
+    total = 0.0
+    for i in range(faces.shape[0]):
+        a = faces[i, 0]
+        b = faces[i, 1]
+        c = faces[i, 2]
+        ax, ay, az = vertices[a, 0], vertices[a, 1], vertices[a, 2]
+        bx, by, bz = vertices[b, 0], vertices[b, 1], vertices[b, 2]
+        cx, cy, cz = vertices[c, 0], vertices[c, 1], vertices[c, 2]
+        total += ax * (by * cz - bz * cy) + ay * (bz * cx - bx * cz) + az * (bx * cy - by * cx)
+    return total / 6.0
+
+
+def _area_kernel(vertices: np.ndarray, faces: np.ndarray) -> float:
+    """按面片累加三角形面积"""
+    total = 0.0
+    for i in range(faces.shape[0]):
+        a = faces[i, 0]
+        b = faces[i, 1]
+        c = faces[i, 2]
+        ux = vertices[b, 0] - vertices[a, 0]
+        uy = vertices[b, 1] - vertices[a, 1]
+        uz = vertices[b, 2] - vertices[a, 2]
+        vx = vertices[c, 0] - vertices[a, 0]
+        vy = vertices[c, 1] - vertices[a, 1]
+        vz = vertices[c, 2] - vertices[a, 2]
+        nx = uy * vz - uz * vy
+        ny = uz * vx - ux * vz
+        nz = ux * vy - uy * vx
+        total += np.sqrt(nx * nx + ny * ny + nz * nz)
+    return total / 2.0
+
+
+def _volume_area_kernel(vertices: np.ndarray, faces: np.ndarray) -> Tuple[float, float]:
+    """单次遍历面片，同时累加有符号体积和表面积"""
+    volume = 0.0
+    area = 0.0
+    for i in range(faces.shape[0]):
+        a = faces[i, 0]
+        b = faces[i, 1]
+        c = faces[i, 2]
+        ax, ay, az = vertices[a, 0], vertices[a, 1], vertices[a, 2]
+        bx, by, bz = vertices[b, 0], vertices[b, 1], vertices[b, 2]
+        cx, cy, cz = vertices[c, 0], vertices[c, 1], vertices[c, 2]
+        volume += ax * (by * cz - bz * cy) + ay * (bz * cx - bx * cz) + az * (bx * cy - by * cx)
+        ux, uy, uz = bx - ax, by - ay, bz - az
+        vx, vy, vz = cx - ax, cy - ay, cz - az
+        nx = uy * vz - uz * vy
+        ny = uz * vx - ux * vz
+        nz = ux * vy - uy * vx
+        area += np.sqrt(nx * nx + ny * ny + nz * nz)
+    return volume / 6.0, area / 2.0
+
+
+if njit is not None:
+    # Reason: cache=True 将编译结果写入磁盘，首次编译开销每次安装只需支付一次；
+    # 不使用 parallel=True：逐面累加受内存带宽限制，而且在工作线程中首次启动
+    # numba 并行线程池会导致解释器退出时挂起（API 在线程池中执行分析）
+    _volume_kernel = njit(cache=True, fastmath=True)(_volume_kernel)
+    _area_kernel = njit(cache=True, fastmath=True)(_area_kernel)
+    _volume_area_kernel = njit(cache=True, fastmath=True)(_volume_area_kernel)
+
+
+# 平移到包围盒中心后坐标仍超过该值时float32精度不足，保留float64
+FLOAT32_COORDINATE_LIMIT = 1e6
+
+
+def mesh_kernel_arrays(mesh) -> Tuple[np.ndarray, np.ndarray]:
+    """获取几何内核使用的连续内存顶点和面片数组（顶点平移到包围盒中心）"""
+    # Reason: 内核受内存带宽限制，float32/int32 使读取量减半；累加仍使用float64
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    if vertices.size:
+        # Reason: 有符号四面体体积以原点为公共顶点累加，远离原点的模型各项数值很大且相互抵消，
+        # 先平移到包围盒中心再转换精度，避免float32舍入误差被放大（封闭网格的体积和面积与平移无关）
+        vertices = vertices - (vertices.min(axis=0) + vertices.max(axis=0)) / 2.0
+    if vertices.size and np.abs(vertices).max() > FLOAT32_COORDINATE_LIMIT:
+        vertex_dtype = np.float64
+    else:
+        vertex_dtype = np.float32
+    faces = np.asarray(mesh.faces)
+    face_dtype = np.int32 if len(vertices) <= np.iinfo(np.int32).max else np.int64
+    return (np.ascontiguousarray(vertices, dtype=vertex_dtype),
+            np.ascontiguousarray(faces, dtype=face_dtype))
+
+
+def warmup_kernels() -> None:
+    """预编译几何计算内核，提前支付首次调用的JIT开销"""
+    if njit is None:
+        return
+    faces = np.array([[0, 1, 2]], dtype=np.int32)
+    for dtype in (np.float32, np.float64):
+        vertices = np.zeros((3, 3), dtype=dtype)
+        _volume_kernel(vertices, faces)
+        _area_kernel(vertices, faces)
+        _volume_area_kernel(vertices, faces)
+
 
 class ModelLoader:
     """3D模型加载器"""
@@ -44,10 +151,11 @@ class ModelLoader:
         if file_ext not in valid_extensions:
             return False
 
-        # 尝试加载文件验证格式
+        # 尝试按声明的格式加载文件验证格式
         try:
-            mesh = trimesh.load_mesh(file_path)
-            return mesh is not None
+            mesh = self.load_model(file_path, expected_format)
+            # Reason: trimesh对无法识别的内容可能返回空网格而不抛出异常
+            return mesh is not None and len(getattr(mesh, "faces", ())) > 0
         except Exception:
             return False
 
@@ -57,7 +165,8 @@ class ModelLoader:
             raise ImportError("trimesh库未安装")
 
         try:
-            mesh = trimesh.load_mesh(file_path)
+            # 直接指定文件类型，跳过按扩展名推断
+            mesh = trimesh.load_mesh(file_path, file_type=getattr(format, "value", format))
             return mesh
         except Exception as e:
             raise ValueError(f"无法加载模型文件 {file_path}: {str(e)}")
@@ -67,18 +176,21 @@ class ModelLoader:
         if not trimesh:
             raise ImportError("trimesh库未安装")
 
-        bbox = mesh.bounds
-        bounding_box = [bbox[0][0], bbox[0][1], bbox[0][2],
-                       bbox[1][0], bbox[1][1], bbox[1][2]]
+        # [min_x, min_y, min_z, max_x, max_y, max_z]，一次转换为Python浮点数列表
+        bounding_box = mesh.bounds.ravel().tolist()
+        vertex_count = mesh.vertices.shape[0]
+        face_count = mesh.faces.shape[0]
 
         return ModelInfo(
             model_id="",  # 由调用者设置
             file_name="",  # 由调用者设置
             file_format=ModelFormat.STL,  # 由调用者设置
             file_size=0,  # 由调用者设置
-            vertex_count=len(mesh.vertices),
-            face_count=len(mesh.faces),
+            vertex_count=vertex_count,
+            face_count=face_count,
             bounding_box=bounding_box,
+            extents=mesh.extents.tolist(),
+            signature=mesh_signature(vertex_count, face_count, bounding_box),
             # upload_time 现在有默认值，会自动设置为当前时间
             features=[]
         )
@@ -87,23 +199,27 @@ class ModelLoader:
 class GeometryAnalyzer:
     """几何分析器"""
 
+    # 平面检测：法线量化步长，以及相对于模型尺度的平面偏移量化步长
+    planar_normal_tolerance = 1e-3
+    planar_offset_tolerance = 1e-4
+    # 至少包含多少个面片才作为平面特征输出
+    planar_min_faces = 2
+
     def __init__(self):
         self.model_loader = ModelLoader()
 
-    def check_topology(self, mesh) -> TopologyCheckResult:
-        """检查模型拓扑"""
+    def check_topology(self, mesh, detailed: bool = False) -> TopologyCheckResult:
+        """检查模型拓扑（detailed为True时才进行代价较高的自相交检查）"""
         if not trimesh:
             raise ImportError("trimesh库未安装")
 
         try:
-            # 检查是否为流形
-            is_manifold = mesh.is_watertight
+            # 检查水密性（流形检查使用同一结果，只需遍历一次边）
+            is_watertight = bool(mesh.is_watertight)
+            is_manifold = is_watertight
 
             # 检查自相交
-            has_self_intersections = mesh.self_intersecting
-
-            # 检查水密性
-            is_watertight = mesh.is_watertight
+            has_self_intersections = bool(mesh.self_intersecting) if detailed else False
 
             issues = []
             if not is_manifold:
@@ -157,14 +273,46 @@ class GeometryAnalyzer:
         """检测平面特征"""
         features = []
 
-        # 简化的平面检测逻辑
-        # 在实际实现中，这里应该使用更复杂的算法
+        # 简化的平面检测逻辑：法线和平面偏移量化后相同的面片视为同一平面
         try:
             # 计算面法线
-            face_normals = mesh.face_normals
+            face_normals = np.asarray(mesh.face_normals, dtype=np.float64)
+            if not len(face_normals):
+                return features
+
+            offsets = np.einsum('ij,ij->i', face_normals, mesh.triangles_center)
+            offset_step = self.planar_offset_tolerance * max(float(mesh.scale), 1e-12)
+            keys = np.column_stack((
+                np.round(face_normals / self.planar_normal_tolerance),
+                np.round(offsets / offset_step)
+            )).astype(np.int64)
+
+            # Reason: 按量化键排序分组，整体为向量化的O(F log F)，无需逐面比较已有平面；
+            # lexsort是稳定排序，组内面片索引保持升序
+            order = np.lexsort(keys.T[::-1])
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.concatenate((
+                [True], np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+            )))
+            ends = np.append(starts[1:], len(order))
+            large = (ends - starts) >= self.planar_min_faces
+
+            face_areas = mesh.area_faces
+            triangles = mesh.triangles
+            for start, end in zip(starts[large], ends[large]):
+                group = order[start:end]
+                points = triangles[group].reshape(-1, 3)
+                features.append(GeometricFeature(
+                    entity_type=GeometricEntity.PLANE,
+                    indices=group.tolist(),
+                    properties={
+                        "normal": face_normals[group[0]].tolist(),
+                        "area": float(face_areas[group].sum()),
+                        "face_count": len(group)
+                    },
+                    bounding_box=points.min(axis=0).tolist() + points.max(axis=0).tolist()
+                ))
 
-            # 这里可以添加更复杂的平面检测逻辑
-            # 目前返回空列表，等待后续实现
             return features
 
         except Exception:
@@ -203,28 +351,65 @@ class GeometryAnalyzer:
         if len(point1) != 3 or len(point2) != 3:
             raise ValueError("点坐标必须是3维")
 
-        return np.linalg.norm(np.array(point1) - np.array(point2))
+        # Reason: 单个三维距离直接用标量运算，避免构造numpy数组的开销
+        dx = point1[0] - point2[0]
+        dy = point1[1] - point2[1]
+        dz = point1[2] - point2[2]
+        return math.sqrt(dx * dx + dy * dy + dz * dz)
+
+    def measure_distances_batch(self, points_a: np.ndarray, points_b: np.ndarray) -> np.ndarray:
+        """批量测量点对距离（形状为(N, 3)的点数组，支持广播）"""
+        points_a = np.asarray(points_a, dtype=np.float64)
+        points_b = np.asarray(points_b, dtype=np.float64)
+        if points_a.shape[-1] != 3 or points_b.shape[-1] != 3:
+            raise ValueError("点坐标必须是3维")
+
+        diff = points_a - points_b
+        distances = np.einsum('...i,...i->...', diff, diff)
+        return np.sqrt(distances, out=distances)
 
-    def measure_volume(self, mesh) -> float:
+    def measure_volume(self, mesh, arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> float:
         """测量体积"""
         if not trimesh:
             raise ImportError("trimesh库未安装")
 
         try:
-            return mesh.volume
+            if njit is None:
+                return mesh.volume
+            vertices, faces = arrays if arrays is not None else mesh_kernel_arrays(mesh)
+            return float(_volume_kernel(vertices, faces))
         except Exception:
             return 0.0
 
-    def measure_surface_area(self, mesh) -> float:
+    def measure_surface_area(self, mesh, arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> float:
         """测量表面积"""
         if not trimesh:
             raise ImportError("trimesh库未安装")
 
         try:
-            return mesh.area
+            if njit is None:
+                return mesh.area
+            vertices, faces = arrays if arrays is not None else mesh_kernel_arrays(mesh)
+            return float(_area_kernel(vertices, faces))
         except Exception:
             return 0.0
 
+    def measure_volume_and_area(self, mesh, arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                                ) -> Tuple[float, float]:
+        """同时测量体积和表面积"""
+        if not trimesh:
+            raise ImportError("trimesh库未安装")
+
+        try:
+            if njit is None:
+                return mesh.volume, mesh.area
+            # Reason: 两个量都需要时只遍历一次面片数组，大网格上内存带宽是主要瓶颈
+            vertices, faces = arrays if arrays is not None else mesh_kernel_arrays(mesh)
+            volume, area = _volume_area_kernel(vertices, faces)
+            return float(volume), float(area)
+        except Exception:
+            return 0.0, 0.0
+
 
 class ModelProcessor:
     """模型处理器 - 负责模型文件的管理和处理"""
@@ -234,17 +419,24 @@ class ModelProcessor:
         self.upload_dir.mkdir(exist_ok=True)
         self.geometry_analyzer = GeometryAnalyzer()
 
-    def save_uploaded_file(self, file_content: bytes, filename: str) -> str:
-        """保存上传的文件"""
+    # 上传文件分块写入的块大小（1MB）
+    copy_chunk_size = 1 << 20
+
+    def save_uploaded_file(self, file_content: Union[bytes, BinaryIO], filename: str) -> str:
+        """保存上传的文件（支持字节串或二进制文件对象，按块流式写入）"""
         file_path = self.upload_dir / filename
 
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
+        # Reason: 接受文件对象时按块复制，无需把整个上传文件读入内存；字节串包装后走同一路径
+        if isinstance(file_content, (bytes, bytearray, memoryview)):
+            file_content = io.BytesIO(file_content)
+
+        with open(file_path, 'wb', buffering=self.copy_chunk_size) as f:
+            shutil.copyfileobj(file_content, f, self.copy_chunk_size)
 
         return str(file_path)
 
-    def process_model(self, file_path: str, format: ModelFormat) -> Dict[str, Any]:
-        """处理模型文件"""
+    def process_model(self, file_path: str, format: ModelFormat, detailed: bool = False) -> Dict[str, Any]:
+        """处理模型文件（detailed为True时拓扑检查包括自相交检查）"""
         try:
             # 加载模型
             mesh = self.geometry_analyzer.model_loader.load_model(file_path, format)
@@ -253,13 +445,14 @@ class ModelProcessor:
             model_info = self.geometry_analyzer.model_loader.get_model_info(mesh)
 
             # 检查拓扑
-            topology_result = self.geometry_analyzer.check_topology(mesh)
+            topology_result = self.geometry_analyzer.check_topology(mesh, detailed=detailed)
 
             # 检测特征
             features = self.geometry_analyzer.detect_features(mesh)
 
             return {
                 "mesh": mesh,
+                "kernel_arrays": mesh_kernel_arrays(mesh),
                 "model_info": model_info,
                 "topology_result": topology_result,
                 "features": features
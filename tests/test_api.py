@@ -0,0 +1,336 @@
+"""
+FastAPI接口测试
+"""
+
+import asyncio
+import io
+import json
+import os
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from nl_mesh_inspect.api.main import (
+    ConnectionManager, UPLOAD_DIR, _ERROR_TEMPLATE, _serialize_update, app, agent,
+    upload_model
+)
+from nl_mesh_inspect.models import AnalysisResult, ErrorResponse, ModelFormat, RealTimeUpdate
+
+
+class TestConnectionManager:
+    """WebSocket连接管理器测试"""
+
+    def setup_method(self):
+        self.manager = ConnectionManager()
+        self.update = RealTimeUpdate(type="model_deleted", model_id="model-1", data={})
+        self.message = _serialize_update(self.update)
+
+    @pytest.mark.asyncio
+    async def test_connect_and_disconnect(self):
+        """测试连接和断开"""
+        websocket = AsyncMock()
+
+        await self.manager.connect(websocket)
+        assert websocket in self.manager.active_connections
+
+        self.manager.disconnect(websocket)
+        assert websocket not in self.manager.active_connections
+
+        # 重复断开不应报错
+        self.manager.disconnect(websocket)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_sends_to_all(self):
+        """测试广播发送到所有连接"""
+        sockets = [AsyncMock(), AsyncMock(), AsyncMock()]
+        for websocket in sockets:
+            await self.manager.connect(websocket)
+
+        await self.manager.broadcast(self.update)
+
+        for websocket in sockets:
+            websocket.send_text.assert_awaited_once_with(self.message)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_drops_failed_connections(self):
+        """测试广播时移除失效连接"""
+        healthy = AsyncMock()
+        broken = AsyncMock()
+        broken.send_text.side_effect = RuntimeError("connection closed")
+
+        await self.manager.connect(healthy)
+        await self.manager.connect(broken)
+
+        await self.manager.broadcast(self.update)
+
+        assert healthy in self.manager.active_connections
+        assert broken not in self.manager.active_connections
+
+
+    @pytest.mark.asyncio
+    async def test_broadcast_drops_cancelled_connections(self):
+        """测试广播时移除发送被取消的连接"""
+        healthy = AsyncMock()
+        cancelled = AsyncMock()
+        cancelled.send_text.side_effect = asyncio.CancelledError()
+
+        await self.manager.connect(healthy)
+        await self.manager.connect(cancelled)
+
+        await self.manager.broadcast(self.update)
+
+        healthy.send_text.assert_awaited_once_with(self.message)
+        assert self.manager.active_connections == {healthy}
+
+
+    @pytest.mark.asyncio
+    async def test_broadcast_without_connections_skips_serialization(self):
+        """测试没有连接时广播不进行序列化"""
+        with patch("nl_mesh_inspect.api.main._serialize_update") as mock_serialize:
+            await self.manager.broadcast(self.update)
+
+        mock_serialize.assert_not_called()
+
+
+class TestUploadEndpoint:
+    """模型上传接口测试"""
+
+    def setup_method(self):
+        self.client = TestClient(app)
+
+    def _uploaded_files(self) -> set:
+        return set(os.listdir(UPLOAD_DIR))
+
+    def test_upload_streams_file_to_disk(self):
+        """测试上传文件被流式写入磁盘并注册"""
+        content = b"solid test\nendsolid test\n"
+        with patch.object(UploadFile, "read", autospec=True) as mock_read:
+            response = self.client.post(
+                "/api/models/upload",
+                files={"file": ("stream.stl", content, "application/octet-stream")},
+                data={"file_format": "stl"}
+            )
+
+        # 文件应按块复制到磁盘，而不是整体读入内存
+        mock_read.assert_not_called()
+
+        assert response.status_code == 200
+        result = response.json()
+        assert result["success"] is True
+        assert result["model_info"]["file_name"] == "stream.stl"
+        assert result["model_info"]["file_size"] == len(content)
+
+        model_id = result["model_id"]
+        file_path = agent.langgraph_agent.model_cache[model_id]["file_path"]
+        assert os.path.exists(file_path)
+        with open(file_path, "rb") as f:
+            assert f.read() == content
+
+        assert agent.cleanup_model(model_id) is True
+        assert not os.path.exists(file_path)
+
+    def test_upload_removes_partial_file_when_copy_fails(self):
+        """测试写入中断时清理不完整的文件"""
+        before = self._uploaded_files()
+
+        def failing_save(source, destination):
+            with open(destination, "wb") as f:
+                f.write(b"partial")
+            raise OSError("磁盘已满")
+
+        with patch("nl_mesh_inspect.api.main._save_upload_stream", side_effect=failing_save):
+            response = self.client.post(
+                "/api/models/upload",
+                files={"file": ("partial.stl", b"data", "application/octet-stream")},
+                data={"file_format": "stl"}
+            )
+
+        assert response.status_code == 500
+        assert self._uploaded_files() == before
+
+    def test_upload_removes_file_when_processing_raises(self):
+        """测试处理抛出异常时清理已写入的文件"""
+        before = self._uploaded_files()
+
+        with patch.object(agent, "process_upload_path", side_effect=RuntimeError("处理失败")):
+            response = self.client.post(
+                "/api/models/upload",
+                files={"file": ("broken.stl", b"data", "application/octet-stream")},
+                data={"file_format": "stl"}
+            )
+
+        assert response.status_code == 500
+        assert self._uploaded_files() == before
+
+    @pytest.mark.asyncio
+    async def test_upload_without_filename_uses_default(self):
+        """测试未提供文件名时使用默认文件名"""
+        upload = UploadFile(file=io.BytesIO(b"data"), filename=None)
+
+        result = await upload_model(file=upload, file_format=ModelFormat.STL)
+
+        assert result["success"] is True
+        assert result["model_info"]["file_name"] == "model.stl"
+        assert agent.cleanup_model(result["model_id"]) is True
+
+    def test_upload_rejects_unknown_format(self):
+        """测试上传不支持的格式"""
+        response = self.client.post(
+            "/api/models/upload",
+            files={"file": ("model.xyz", b"data", "application/octet-stream")},
+            data={"file_format": "xyz"}
+        )
+
+        assert response.status_code == 422
+
+
+class TestDownloadEndpoint:
+    """模型下载接口测试"""
+
+    def setup_method(self):
+        self.client = TestClient(app)
+
+    def test_download_returns_original_file(self):
+        """测试下载返回上传的原始文件"""
+        content = b"solid test\nendsolid test\n"
+        upload = self.client.post(
+            "/api/models/upload",
+            files={"file": ("download.stl", content, "application/octet-stream")},
+            data={"file_format": "stl"}
+        )
+        model_id = upload.json()["model_id"]
+
+        try:
+            response = self.client.get(f"/api/models/{model_id}/download")
+
+            assert response.status_code == 200
+            assert response.content == content
+            assert response.headers["content-type"] == "application/octet-stream"
+            assert "download.stl" in response.headers["content-disposition"]
+        finally:
+            agent.cleanup_model(model_id)
+
+    def test_download_unknown_model(self):
+        """测试下载不存在的模型返回404"""
+        response = self.client.get("/api/models/non-existent-model/download")
+
+        assert response.status_code == 404
+
+    def test_download_missing_file(self):
+        """测试模型文件已不在磁盘上时返回404"""
+        with patch.object(agent, "get_model_info", return_value=object()), \
+                patch.object(agent, "get_model_file_path", return_value="/nonexistent/model.stl"):
+            response = self.client.get("/api/models/some-model/download")
+
+        assert response.status_code == 404
+
+
+class TestAnalyzeEndpoint:
+    """模型分析接口测试"""
+
+    def setup_method(self):
+        self.client = TestClient(app)
+
+    def test_analyze_runs_in_threadpool(self):
+        """测试分析在工作线程中执行，不阻塞事件循环线程"""
+        calls = {}
+
+        def fake_analyze(request):
+            try:
+                asyncio.get_running_loop()
+                calls["in_event_loop"] = True
+            except RuntimeError:
+                calls["in_event_loop"] = False
+            return AnalysisResult(
+                success=False,
+                result_type="model_not_found",
+                data={},
+                message="未找到模型",
+                execution_time=0.0,
+                state_id=request.state_id
+            )
+
+        with patch.object(agent, "analyze_model", side_effect=fake_analyze):
+            response = self.client.post(
+                "/api/models/some-model/analyze",
+                json={
+                    "model_id": "some-model",
+                    "natural_language_query": "测量体积",
+                    "state_id": agent.get_current_state()
+                }
+            )
+
+        assert response.status_code == 200
+        assert response.json()["result_type"] == "model_not_found"
+        assert calls["in_event_loop"] is False
+
+
+class TestSerializeUpdate:
+    """实时更新消息序列化测试"""
+
+    def test_serialize_update_roundtrip(self):
+        """测试序列化结果可还原为相同的消息"""
+        update = RealTimeUpdate(
+            type="analysis_completed",
+            model_id="model-1",
+            data={"query": "测量体积", "execution_time": 0.5}
+        )
+
+        payload = json.loads(_serialize_update(update))
+
+        assert payload["type"] == "analysis_completed"
+        assert payload["data"] == {"query": "测量体积", "execution_time": 0.5}
+        assert RealTimeUpdate(**payload).timestamp == update.timestamp
+
+    def test_serialize_update_without_orjson(self):
+        """测试未安装orjson时回退到Pydantic序列化"""
+        update = RealTimeUpdate(type="model_deleted", model_id="model-1", data={})
+
+        with patch("nl_mesh_inspect.api.main.orjson", None):
+            payload = json.loads(_serialize_update(update))
+
+        assert payload["type"] == "model_deleted"
+
+    def test_serialize_update_non_string_keys(self):
+        """测试orjson无法处理的数据回退到Pydantic"""
+        update = RealTimeUpdate(type="custom", model_id="model-1", data={"counts": {1: "a"}})
+
+        payload = json.loads(_serialize_update(update))
+
+        assert payload["data"] == {"counts": {"1": "a"}}
+
+
+class TestErrorHandlers:
+    """异常处理器测试"""
+
+    def setup_method(self):
+        self.client = TestClient(app, raise_server_exceptions=False)
+
+    def test_http_exception_response_matches_error_schema(self):
+        """测试HTTP异常响应字段与ErrorResponse一致"""
+        response = self.client.get("/api/models/non-existent-model")
+
+        assert response.status_code == 404
+        payload = response.json()
+        assert set(payload) == set(ErrorResponse.model_fields)
+        assert payload["details"] is None
+        assert payload["state_id"] == agent.get_current_state()
+        assert ErrorResponse(**payload).error == payload["error"]
+
+    def test_general_exception_response(self):
+        """测试未处理异常返回500及错误详情"""
+        with patch.object(agent, "get_model_info", side_effect=RuntimeError("boom")):
+            response = self.client.get("/api/models/any-model")
+
+        assert response.status_code == 500
+        payload = response.json()
+        assert payload["error"] == "内部服务器错误"
+        assert payload["details"] == {"message": "boom"}
+
+    def test_error_template_is_not_mutated(self):
+        """测试处理器不会修改共享的错误模板"""
+        self.client.get("/api/models/non-existent-model")
+
+        assert _ERROR_TEMPLATE == {"error": None, "details": None, "state_id": None}
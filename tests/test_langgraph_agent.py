@@ -0,0 +1,285 @@
+"""
+LangGraph智能体测试
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+import trimesh
+from unittest.mock import Mock, patch
+
+from nl_mesh_inspect.langgraph_agent import LangGraphNLMeshAgent
+from nl_mesh_inspect.models import AnalysisRequest
+
+
+class TestLangGraphNLMeshAgent:
+    """LangGraph智能体测试"""
+
+    def setup_method(self):
+        self.agent = LangGraphNLMeshAgent()
+        self.agent.model_cache["test-model"] = {
+            "mesh": Mock(),
+            "model_info": Mock(),
+            "topology_result": Mock(),
+            "file_path": "/uploads/test.stl"
+        }
+
+    def _request(self, query: str) -> AnalysisRequest:
+        return AnalysisRequest(
+            model_id="test-model",
+            natural_language_query=query,
+            state_id=self.agent.current_state_id
+        )
+
+    def test_repeat_measurement_uses_analysis_cache(self):
+        """测试重复测量请求复用分析缓存"""
+        analyzer = self.agent.geometry_analyzer
+        with patch.object(analyzer, "measure_volume_and_area",
+                                  return_value=(1000.0, 600.0)) as mock_measure:
+            first = self.agent.analyze_model(self._request("测量体积"))
+            second = self.agent.analyze_model(self._request("测量体积"))
+
+        assert first.success is True
+        assert second.data["measurements"] == first.data["measurements"]
+        assert mock_measure.call_count == 1
+
+    def test_cached_analysis_keeps_query_entities(self):
+        """测试缓存命中时实体信息仍来自当前查询"""
+        analyzer = self.agent.geometry_analyzer
+        with patch.object(analyzer, "measure_volume_and_area", return_value=(1000.0, 600.0)):
+            self.agent.analyze_model(self._request("测量体积"))
+            result = self.agent.analyze_model(self._request("测量孔的体积"))
+
+        assert result.success is True
+        assert [e["keyword"] for e in result.data["entities"]] == ["孔"]
+
+    def test_cleanup_model_drops_analysis_cache(self):
+        """测试清理模型时同时清理分析缓存"""
+        analyzer = self.agent.geometry_analyzer
+        with patch.object(analyzer, "measure_volume_and_area", return_value=(1000.0, 600.0)):
+            self.agent.analyze_model(self._request("测量体积"))
+
+        assert "test-model" in self.agent.analysis_cache
+
+        with patch("os.path.exists", return_value=False):
+            assert self.agent.cleanup_model("test-model") is True
+
+        assert "test-model" not in self.agent.analysis_cache
+
+    def test_unhashable_parameters_skip_cache(self):
+        """测试参数不可哈希时跳过缓存"""
+        assert self.agent._analysis_cache_key("measurement", {"points": [1, 2]}) is None
+        assert self.agent._analysis_cache_key("measurement", {"min_value": 5.0}) is not None
+
+    def test_unsortable_parameters_skip_cache(self):
+        """测试参数键不可排序时跳过缓存而不是报错"""
+        assert self.agent._analysis_cache_key("measurement", {1: "a", "b": 2}) is None
+
+    def test_analysis_cache_is_bounded(self):
+        """测试每个模型的分析缓存有容量上限"""
+        analyzer = self.agent.geometry_analyzer
+        with patch.object(type(self.agent), "analysis_cache_maxsize", 2), \
+                patch.object(analyzer, "measure_volume_and_area", return_value=(1000.0, 600.0)):
+            for value in (1.0, 2.0, 3.0):
+                request = self._request("测量体积").model_copy(
+                    update={"parameters": {"target_value": value}}
+                )
+                self.agent.analyze_model(request)
+
+        cached_parameters = [key[1] for key in self.agent.analysis_cache["test-model"]]
+        assert cached_parameters == [(("target_value", 2.0),), (("target_value", 3.0),)]
+
+    def test_kernel_warmup_runs_in_background(self):
+        """测试内核预热在后台守护线程中运行"""
+        assert self.agent._warmup_thread.daemon is True
+        self.agent._warmup_thread.join(timeout=30)
+        assert not self.agent._warmup_thread.is_alive()
+
+    def test_kernel_warmup_failure_is_ignored(self):
+        """测试内核预热失败不影响智能体"""
+        with patch("nl_mesh_inspect.langgraph_agent.warmup_kernels",
+                   side_effect=RuntimeError("jit")) as mock_warmup:
+            self.agent._warmup_kernels()
+
+        mock_warmup.assert_called_once_with()
+
+        # 预热失败后测量仍可正常使用
+        with patch.object(self.agent.geometry_analyzer, "measure_volume_and_area",
+                          return_value=(1000.0, 600.0)):
+            result = self.agent.analyze_model(self._request("测量体积"))
+        assert result.success is True
+
+    def test_process_exits_after_agent_construction(self):
+        """测试构造智能体（触发后台预热）后进程能正常退出"""
+        script = textwrap.dedent("""
+            from nl_mesh_inspect.langgraph_agent import LangGraphNLMeshAgent
+
+            agent = LangGraphNLMeshAgent()
+            agent._warmup_thread.join()
+        """)
+
+        completed = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            timeout=120
+        )
+
+        assert completed.returncode == 0, completed.stderr.decode()
+
+    @pytest.mark.parametrize("query", ["", "   ", "a", " 测 "])
+    def test_trivial_query_short_circuits(self, query):
+        """测试空查询或过短查询直接返回，不进行解析"""
+        with patch.object(self.agent.query_parser, "parse_query_cached") as mock_parse:
+            result = self.agent.analyze_model(self._request(query))
+
+        assert result.success is False
+        assert result.result_type == "invalid_query"
+        mock_parse.assert_not_called()
+
+    def test_invalid_query_checked_before_model_lookup(self):
+        """测试无效查询在查找模型之前被拒绝"""
+        invalid = {"is_valid": False, "intent": None, "query_type": None,
+                   "entities": [], "parameters": {}}
+        request = self._request("删除这个").model_copy(update={"model_id": "non-existent-model"})
+
+        with patch.object(self.agent.query_parser, "parse_query_cached", return_value=invalid):
+            result = self.agent.analyze_model(request)
+
+        assert result.result_type == "invalid_query"
+
+    def test_valid_query_for_missing_model(self):
+        """测试有效查询但模型不存在时返回模型未找到"""
+        request = self._request("测量体积").model_copy(update={"model_id": "non-existent-model"})
+
+        result = self.agent.analyze_model(request)
+
+        assert result.success is False
+        assert result.result_type == "model_not_found"
+
+
+class TestModelCacheResidency:
+    """模型缓存网格常驻上限测试"""
+
+    def setup_method(self):
+        self.agent = LangGraphNLMeshAgent()
+
+    def _upload_box(self, tmp_path, name: str) -> str:
+        file_path = tmp_path / name
+        trimesh.creation.box(extents=[10, 10, 10]).export(str(file_path))
+        result = self.agent.process_upload_path(str(file_path), name, "stl")
+        assert result["success"] is True
+        return result["model_id"]
+
+    def test_least_recently_used_mesh_is_released(self, tmp_path):
+        """测试超出常驻上限时释放最久未使用的网格，但保留模型信息"""
+        with patch.object(type(self.agent), "max_resident_meshes", 2):
+            first = self._upload_box(tmp_path, "a.stl")
+            second = self._upload_box(tmp_path, "b.stl")
+            third = self._upload_box(tmp_path, "c.stl")
+
+        assert self.agent.model_cache[first]["mesh"] is None
+        assert self.agent.model_cache[second]["mesh"] is not None
+        assert self.agent.model_cache[third]["mesh"] is not None
+        assert self.agent.get_model_info(first).file_name == "a.stl"
+
+    def test_kernel_arrays_cached_with_mesh(self, tmp_path):
+        """测试内核数组随网格缓存，网格释放时一并释放"""
+        with patch.object(type(self.agent), "max_resident_meshes", 1):
+            first = self._upload_box(tmp_path, "a.stl")
+            vertices, faces = self.agent.model_cache[first]["kernel_arrays"]
+            assert vertices.dtype == np.float32
+
+            self._upload_box(tmp_path, "b.stl")
+
+        assert self.agent.model_cache[first]["kernel_arrays"] is None
+
+    def test_released_mesh_is_reloaded_on_analysis(self, tmp_path):
+        """测试已释放的网格在分析时从文件重新加载"""
+        with patch.object(type(self.agent), "max_resident_meshes", 1):
+            first = self._upload_box(tmp_path, "a.stl")
+            second = self._upload_box(tmp_path, "b.stl")
+            assert self.agent.model_cache[first]["mesh"] is None
+
+            result = self.agent.analyze_model(AnalysisRequest(
+                model_id=first,
+                natural_language_query="测量体积",
+                state_id=self.agent.current_state_id
+            ))
+
+        assert result.success is True
+        assert result.data["measurements"]["volume"] == pytest.approx(1000.0)
+        assert self.agent.model_cache[first]["mesh"] is not None
+        assert self.agent.model_cache[second]["mesh"] is None
+
+    def test_feature_detection_reports_planes(self, tmp_path):
+        """测试特征检测返回平面特征并生成响应消息"""
+        model_id = self._upload_box(tmp_path, "a.stl")
+
+        result = self.agent.analyze_model(AnalysisRequest(
+            model_id=model_id,
+            natural_language_query="检测所有平面特征",
+            state_id=self.agent.current_state_id
+        ))
+
+        assert result.success is True
+        assert result.data["total_features"] == 6
+        assert "plane" in result.message
+
+    def test_features_reuse_upload_results(self, tmp_path):
+        """测试特征检测复用上传时的计算结果"""
+        model_id = self._upload_box(tmp_path, "a.stl")
+
+        with patch.object(self.agent.geometry_analyzer, "detect_features") as mock_features:
+            features = self.agent.analyze_model(AnalysisRequest(
+                model_id=model_id,
+                natural_language_query="检测所有平面特征",
+                state_id=self.agent.current_state_id
+            ))
+
+        mock_features.assert_not_called()
+        assert features.data["total_features"] == 6
+
+    def test_topology_query_runs_detailed_check(self, tmp_path):
+        """测试明确的拓扑查询进行包括自相交在内的完整检查"""
+        model_id = self._upload_box(tmp_path, "a.stl")
+        analyzer = self.agent.geometry_analyzer
+
+        with patch.object(analyzer, "check_topology", wraps=analyzer.check_topology) as mock_topology:
+            self.agent.analyze_model(AnalysisRequest(
+                model_id=model_id,
+                natural_language_query="检查拓扑是否水密",
+                state_id=self.agent.current_state_id
+            ))
+
+        assert mock_topology.call_args.kwargs == {"detailed": True}
+
+class TestStateRotation:
+    """状态ID轮换测试"""
+
+    def setup_method(self):
+        self.agent = LangGraphNLMeshAgent()
+
+    def test_rotation_produces_unique_ids_without_uuid(self):
+        """测试状态轮换生成唯一ID且不调用uuid4"""
+        seen = {self.agent.current_state_id}
+        with patch("nl_mesh_inspect.langgraph_agent.uuid.uuid4") as mock_uuid:
+            for _ in range(100):
+                self.agent._rotate_state()
+                seen.add(self.agent.current_state_id)
+
+        mock_uuid.assert_not_called()
+        assert len(seen) == 101
+
+    def test_cleanup_rotates_state(self):
+        """测试清理模型后状态ID改变"""
+        self.agent.model_cache["m"] = {"mesh": None, "kernel_arrays": None,
+                                       "model_info": Mock(), "file_path": "/nonexistent.stl"}
+        previous = self.agent.current_state_id
+
+        assert self.agent.cleanup_model("m") is True
+        assert self.agent.current_state_id != previous
@@ -2,12 +2,31 @@
 LLM智能体测试 - 测试基于大模型的智能体功能
 """
 
+import json
+import os
+import re
+import subprocess
+import sys
+import textwrap
+import threading
+import uuid
+
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
+from types import MappingProxyType, SimpleNamespace
+
+from nl_mesh_inspect.llm_agent import LLMNLMeshAgent, ModelCache
+from nl_mesh_inspect.models import AnalysisRequest, AnalysisResult, ModelInfo
 
-from nl_mesh_inspect.llm_agent import LLMNLMeshAgent
-from nl_mesh_inspect.models import AnalysisRequest, AnalysisResult
+
+# 只读的共享模型数据（轻量桩对象，避免每个测试重复构造Mock）
+_SHARED_MESH_DATA = MappingProxyType({
+    "mesh": {"vertices": 100, "faces": 200},
+    "model_info": SimpleNamespace(),
+    "topology_result": SimpleNamespace(),
+    "file_path": "/uploads/test.stl"
+})
 
 
 class TestLLMNLMeshAgent:
@@ -47,12 +66,7 @@ class TestLLMNLMeshAgent:
         )
 
         # 添加模型到缓存
-        self.agent.model_cache["test-model"] = {
-            "mesh": {"vertices": 100, "faces": 200},
-            "model_info": Mock(),
-            "topology_result": Mock(),
-            "file_path": "/uploads/test.stl"
-        }
+        self.agent.model_cache["test-model"] = _SHARED_MESH_DATA
 
         state = {
             "request": request,
@@ -93,13 +107,7 @@ class TestLLMNLMeshAgent:
     def test_load_model_success(self):
         """测试模型加载成功"""
         # 添加模型到缓存
-        mock_model_data = {
-            "mesh": {"vertices": 100, "faces": 200},
-            "model_info": Mock(),
-            "topology_result": Mock(),
-            "file_path": "/uploads/test.stl"
-        }
-        self.agent.model_cache["test-model"] = mock_model_data
+        self.agent.model_cache["test-model"] = _SHARED_MESH_DATA
 
         request = AnalysisRequest(
             model_id="test-model",
@@ -119,7 +127,7 @@ class TestLLMNLMeshAgent:
 
         result_state = self.agent._load_model(state)
         assert "error" not in result_state
-        assert result_state["mesh_data"] == mock_model_data
+        assert result_state["mesh_data"] == _SHARED_MESH_DATA
 
     def test_load_model_failure(self):
         """测试模型加载失败"""
@@ -162,12 +170,7 @@ class TestLLMNLMeshAgent:
             state_id=self.agent.current_state_id
         )
 
-        mesh_data = {
-            "mesh": {"vertices": 100, "faces": 200},
-            "model_info": Mock(),
-            "topology_result": Mock(),
-            "file_path": "/uploads/test.stl"
-        }
+        mesh_data = _SHARED_MESH_DATA
 
         state = {
             "request": request,
@@ -181,8 +184,9 @@ class TestLLMNLMeshAgent:
 
         result_state = self.agent._llm_analysis(state)
         assert "error" not in result_state
-        assert len(result_state["messages"]) == 3  # system, user, assistant
-        assert result_state["tool_results"] == []  # 工具执行在下一个阶段
+        assert len(result_state["messages"]) == 4  # system, model info, user, assistant
+        assert result_state["messages"][-1].tool_calls[0]["name"] == "MeasureVolumeTool"
+        assert "tool_results" not in result_state  # 工具执行在下一个阶段
 
     @patch('nl_mesh_inspect.llm_config.execute_tool')
     def test_execute_tools_with_calls(self, mock_execute_tool):
@@ -212,12 +216,7 @@ class TestLLMNLMeshAgent:
         )
         messages.append(assistant_message)
 
-        mesh_data = {
-            "mesh": {"vertices": 100, "faces": 200},
-            "model_info": Mock(),
-            "topology_result": Mock(),
-            "file_path": "/uploads/test.stl"
-        }
+        mesh_data = _SHARED_MESH_DATA
 
         state = {
             "messages": messages,
@@ -232,7 +231,7 @@ class TestLLMNLMeshAgent:
         assert "error" not in result_state
         # 现在应该正确执行工具调用，不触发后备机制
         assert len(result_state["tool_results"]) == 1
-        assert len(result_state["messages"]) == 4  # 添加了tool消息
+        assert len(result_state["messages"]) == 1  # 只返回新增的tool消息，由LangGraph追加
 
     def test_execute_tools_fallback(self):
         """测试工具执行后备机制（无工具调用时）"""
@@ -242,14 +241,14 @@ class TestLLMNLMeshAgent:
             {"role": "assistant", "content": "我将分析模型"}  # 无工具调用
         ]
 
-        mesh_data = {
-            "mesh": {"vertices": 100, "faces": 200},
-            "model_info": Mock(),
-            "topology_result": Mock(),
-            "file_path": "/uploads/test.stl"
-        }
+        mesh_data = _SHARED_MESH_DATA
 
         state = {
+            "request": AnalysisRequest(
+                model_id="test-model",
+                natural_language_query="分析这个模型",
+                state_id=self.agent.current_state_id
+            ),
             "messages": messages,
             "mesh_data": mesh_data,
             "tool_results": [],
@@ -262,6 +261,203 @@ class TestLLMNLMeshAgent:
         assert "error" not in result_state
         assert len(result_state["tool_results"]) == 2  # 后备执行了2个工具
 
+    def test_execute_tools_skips_fallback_for_specific_query(self):
+        """测试非综合分析查询在无工具调用时不执行后备工具"""
+        state = {
+            "request": AnalysisRequest(
+                model_id="test-model",
+                natural_language_query="测量体积",
+                state_id=self.agent.current_state_id
+            ),
+            "messages": [{"role": "assistant", "content": "我将分析模型"}],
+            "mesh_data": {},
+            "tool_results": [],
+        }
+
+        with patch('nl_mesh_inspect.llm_agent.execute_tool') as mock_execute_tool:
+            result_state = self.agent._execute_tools(state)
+
+        assert result_state == {}
+        mock_execute_tool.assert_not_called()
+
+        final_state = self.agent._generate_final_result(state)
+        assert final_state["final_result"].message == "分析完成。未调用任何工具。"
+
+    @pytest.mark.parametrize("query, tool", [
+        ("测量体积", "measure_volume"),
+        ("检查拓扑", "check_topology"),
+    ])
+    def test_specific_query_runs_only_selected_tool(self, query, tool):
+        """测试具体查询不触发后备工具，但LLM选择的工具仍会执行"""
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query=query,
+            state_id=self.agent.current_state_id
+        )
+
+        result = self.agent.analyze_model(request)
+
+        assert [item["tool"] for item in result.data["tool_results"]] == [tool]
+        assert result.message == "分析完成。使用了 1 个工具进行分析。"
+
+    def test_execute_tools_runs_calls_concurrently(self):
+        """测试多个工具调用并发执行，结果保持调用顺序"""
+        from langchain_core.messages import AIMessage
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_execute_tool(tool_name, tool_args, mesh_data):
+            # 三个调用必须同时在执行中才能通过屏障
+            barrier.wait()
+            return {"tool": tool_name}
+
+        names = ["MeasureVolumeTool", "CheckTopologyTool", "DetectHolesTool"]
+        state = {
+            "messages": [AIMessage(
+                content="综合分析",
+                tool_calls=[{"name": name, "args": {}, "id": str(i)} for i, name in enumerate(names)]
+            )],
+            "mesh_data": {},
+            "tool_results": [],
+        }
+
+        with patch('nl_mesh_inspect.llm_agent.execute_tool', side_effect=fake_execute_tool):
+            result_state = self.agent._execute_tools(state)
+
+        assert "error" not in result_state
+        assert [r["tool"] for r in result_state["tool_results"]] == names
+        assert [m["tool_call_id"] for m in result_state["messages"]] == ["0", "1", "2"]
+        assert [json.loads(m["content"]) for m in result_state["messages"]] == [
+            {"tool": name} for name in names
+        ]
+
+    def test_execute_tools_fallback_runs_concurrently(self):
+        """测试后备工具并发执行"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_execute_tool(tool_name, tool_args, mesh_data):
+            barrier.wait()
+            return {"tool": tool_name}
+
+        state = {
+            "request": AnalysisRequest(
+                model_id="test-model",
+                natural_language_query="full overview",
+                state_id=self.agent.current_state_id
+            ),
+            "messages": [{"role": "assistant", "content": "我将分析模型"}],
+            "mesh_data": {},
+            "tool_results": [],
+        }
+
+        with patch('nl_mesh_inspect.llm_agent.execute_tool', side_effect=fake_execute_tool):
+            result_state = self.agent._execute_tools(state)
+
+        assert [r["tool"] for r in result_state["tool_results"]] == [
+            "MeasureVolumeTool", "CheckTopologyTool"
+        ]
+
+    def test_llm_analysis_builds_prompt_messages(self):
+        """测试LLM分析使用提示模板生成带类型的系统消息和用户消息"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        model_info = ModelInfo(
+            model_id="test-model", file_name="part.stl", file_format="stl", file_size=1,
+            vertex_count=3, face_count=1, bounding_box=[0, 0, 0, 1, 1, 1]
+        )
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+        state = {"request": request, "mesh_data": {"model_info": model_info},
+                 "messages": [], "tool_results": []}
+
+        result_state = self.agent._llm_analysis(state)
+
+        assert "error" not in result_state
+        system_message, context_message, user_message = result_state["messages"][:3]
+        assert isinstance(system_message, SystemMessage)
+        assert isinstance(context_message, HumanMessage)
+        assert "文件名：part.stl" in context_message.content
+        assert "格式：stl" in context_message.content
+        assert isinstance(user_message, HumanMessage)
+        assert user_message.content == "请分析这个3D模型：测量体积"
+
+    def test_llm_analysis_system_prefix_is_stable(self):
+        """测试系统消息不含模型信息和查询，不同请求的提示前缀相同"""
+        def prompt_messages(file_name: str, query: str):
+            request = AnalysisRequest(model_id="m", natural_language_query=query,
+                                      state_id=self.agent.current_state_id)
+            state = {"request": request, "mesh_data": {"model_info": {"file_name": file_name}},
+                     "messages": [], "tool_results": []}
+            return self.agent._llm_analysis(state)["messages"]
+
+        first = prompt_messages("a.stl", "统计孔洞数量")
+        second = prompt_messages("b.obj", "检查拓扑")
+
+        assert first[0].content == second[0].content
+        assert "a.stl" not in first[0].content and "统计孔洞数量" not in first[0].content
+
+    def test_llm_analysis_reuses_cached_response(self):
+        """测试相同提示的LLM调用命中响应缓存"""
+        from langchain_core.messages import AIMessage
+
+        response = AIMessage(
+            content="我将使用测量工具",
+            tool_calls=[{"name": "MeasureVolumeTool", "args": {}, "id": "1"}]
+        )
+        messages = [{"role": "user", "content": "测量体积"}]
+
+        with patch('nl_mesh_inspect.llm_agent.llm_with_tools') as mock_llm:
+            mock_llm.temperature = 0
+            mock_llm.invoke.return_value = response
+            first = self.agent._invoke_llm(messages)
+            second = self.agent._invoke_llm(messages)
+
+        assert mock_llm.invoke.call_count == 1
+        assert first is response
+        assert second.content == response.content
+        assert second.tool_calls == response.tool_calls
+        assert self.agent.llm_cache_stats == {"hits": 1, "misses": 1}
+
+    def test_llm_analysis_skips_cache_when_sampling(self):
+        """测试非确定性LLM调用不使用缓存"""
+        from langchain_core.messages import AIMessage
+
+        messages = [{"role": "user", "content": "测量体积"}]
+
+        with patch('nl_mesh_inspect.llm_agent.llm_with_tools') as mock_llm:
+            mock_llm.temperature = 0.7
+            mock_llm.invoke.return_value = AIMessage(content="响应")
+            self.agent._invoke_llm(messages)
+            self.agent._invoke_llm(messages)
+
+        assert mock_llm.invoke.call_count == 2
+        assert len(self.agent.llm_cache) == 0
+
+    def test_llm_analysis_no_cache_request_bypasses_cache(self):
+        """测试请求设置no_cache时每次都调用LLM且不写入缓存"""
+        from langchain_core.messages import AIMessage
+
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id="test-state",
+            no_cache=True
+        )
+        state = {"request": request, "mesh_data": {"model_info": {}}}
+
+        with patch('nl_mesh_inspect.llm_agent.llm_with_tools') as mock_llm:
+            mock_llm.temperature = 0
+            mock_llm.invoke.return_value = AIMessage(content="响应")
+            self.agent._llm_analysis(state)
+            self.agent._llm_analysis(state)
+
+        assert mock_llm.invoke.call_count == 2
+        assert len(self.agent.llm_cache) == 0
+
     def test_generate_final_result_success(self):
         """测试生成最终结果"""
         request = AnalysisRequest(
@@ -322,12 +518,7 @@ class TestLLMNLMeshAgent:
         }
 
         # 添加模型到缓存
-        self.agent.model_cache["test-model"] = {
-            "mesh": {"vertices": 100, "faces": 200},
-            "model_info": Mock(),
-            "topology_result": Mock(),
-            "file_path": "/uploads/test.stl"
-        }
+        self.agent.model_cache["test-model"] = _SHARED_MESH_DATA
 
         request = AnalysisRequest(
             model_id="test-model",
@@ -341,6 +532,174 @@ class TestLLMNLMeshAgent:
         assert result.result_type == "llm_analysis"
         assert result.execution_time > 0
 
+    def _add_test_model(self):
+        self.agent.model_cache["test-model"] = _SHARED_MESH_DATA
+
+    def test_analyze_model_batch_preserves_order(self):
+        """测试批量分析结果按输入顺序返回"""
+        self._add_test_model()
+        queries = ["测量体积", "检查拓扑", "检测孔洞"]
+        requests = [
+            AnalysisRequest(model_id="test-model", natural_language_query=query,
+                            state_id=self.agent.current_state_id)
+            for query in queries
+        ]
+
+        results = self.agent.analyze_model_batch(requests)
+
+        assert [result.data["query"] for result in results] == queries
+        assert all(result.success for result in results)
+        assert all(result.execution_time > 0 for result in results)
+
+    @pytest.mark.asyncio
+    async def test_aanalyze_model_batch(self):
+        """测试异步批量分析"""
+        self._add_test_model()
+        requests = [
+            AnalysisRequest(model_id="test-model", natural_language_query=query,
+                            state_id=self.agent.current_state_id)
+            for query in ["测量体积", "检查拓扑"]
+        ]
+
+        results = await self.agent.aanalyze_model_batch(requests)
+
+        assert [result.data["query"] for result in results] == ["测量体积", "检查拓扑"]
+
+    def test_validate_input_uses_state_snapshot(self):
+        """测试输入验证使用入口处记录的状态ID快照"""
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+        state = self.agent._initial_state(request)
+
+        # 批量执行期间其他请求改变了当前状态
+        self.agent.current_state_id = "rotated-state"
+
+        result_state = self.agent._validate_input(state)
+        assert "error" not in result_state
+
+    def test_nodes_return_only_changed_keys(self):
+        """测试节点只返回变化的状态键，不修改传入的状态"""
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+        state = self.agent._initial_state(request)
+        snapshot = dict(state)
+
+        assert self.agent._validate_input(state) == {}
+        assert set(self.agent._load_model(state)) == {"mesh_data"}
+        assert state == snapshot
+
+    def test_workflow_accumulates_messages(self):
+        """测试工作流通过追加合并消息和工具结果"""
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+
+        final_state = self.agent.workflow.invoke(self.agent._initial_state(request))
+
+        # system, model info, user, assistant, tool
+        assert len(final_state["messages"]) == 5
+        assert final_state["messages"][3].tool_calls[0]["name"] == "MeasureVolumeTool"
+        assert final_state["messages"][4]["tool_call_id"] == "1"
+        assert len(final_state["tool_results"]) == final_state["final_result"].data["tools_used"]
+
+    def test_analyze_model_runs_llm_selected_tool(self):
+        """测试LLM选择的工具调用传递到工具执行阶段并实际执行"""
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+
+        result = self.agent.analyze_model(request)
+
+        assert result.success is True
+        assert result.data["tools_used"] == 1
+        assert result.data["tool_results"][0]["tool"] == "measure_volume"
+        assert result.data["tool_results"][0]["result"]["volume"] == pytest.approx(1000.0)
+
+    def test_stream_analysis_yields_tool_results_before_final(self):
+        """测试流式分析在每个工具完成时产出结果，最后产出最终分析结果"""
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="全面分析这个模型",
+            state_id=self.agent.current_state_id
+        )
+
+        chunks = list(self.agent.stream_analysis(request))
+
+        tool_chunks, final_chunk = chunks[:-1], chunks[-1]
+        assert sorted(chunk["tool_index"] for chunk in tool_chunks) == [0, 1]
+        final_result = final_chunk["final_result"]
+        assert final_result.success is True
+        assert final_result.data["tool_results"] == [
+            chunk["tool_result"] for chunk in sorted(tool_chunks, key=lambda c: c["tool_index"])
+        ]
+
+    def test_stream_analysis_yields_llm_selected_tool_results(self):
+        """测试流式分析产出LLM选择的工具的结果"""
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+
+        chunks = list(self.agent.stream_analysis(request))
+
+        tool_chunks, final_chunk = chunks[:-1], chunks[-1]
+        assert [chunk["tool_index"] for chunk in tool_chunks] == [0]
+        assert tool_chunks[0]["tool_result"]["tool"] == "measure_volume"
+        assert final_chunk["final_result"].data["tool_results"] == [tool_chunks[0]["tool_result"]]
+
+    def test_workflow_compiled_once_and_bound_per_agent(self):
+        """测试所有实例共享同一个编译好的工作流，且节点调用各自智能体的方法"""
+        with patch('langgraph.graph.StateGraph.compile') as mock_compile:
+            other = LLMNLMeshAgent()
+
+        mock_compile.assert_not_called()
+        assert other.workflow.builder is self.agent.workflow.builder
+
+        self._add_test_model()
+        request = AnalysisRequest(
+            model_id="test-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+
+        assert self.agent.analyze_model(request).success is True
+        # 另一个智能体的缓存中没有该模型
+        assert other.analyze_model(request).success is False
+
+    def test_error_branch_stops_workflow(self):
+        """测试节点出错后只进入错误处理分支，不再执行后续节点"""
+        request = AnalysisRequest(
+            model_id="non-existent-model",
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+
+        with patch('nl_mesh_inspect.llm_agent.llm_with_tools') as mock_llm, \
+                patch('nl_mesh_inspect.llm_agent.execute_tool') as mock_execute_tool:
+            result = self.agent.analyze_model(request)
+
+        assert result.success is False
+        assert result.result_type == "error"
+        assert "未找到模型" in result.message
+        mock_llm.invoke.assert_not_called()
+        mock_execute_tool.assert_not_called()
+
     def test_process_upload_success(self):
         """测试上传处理成功"""
         result = self.agent.process_upload(
@@ -354,6 +713,41 @@ class TestLLMNLMeshAgent:
         assert "model_info" in result
         assert "topology_result" in result
         assert "state_id" in result
+        assert re.fullmatch(r"[0-9a-f]{16}", result["model_info"]["signature"])
+
+    def test_process_upload_caches_serialized_model(self):
+        """测试上传时缓存模型信息的字典形式，并直接返回"""
+        result = self.agent.process_upload(
+            file_content=b"test content",
+            filename="test.stl",
+            file_format="stl"
+        )
+
+        model_data = self.agent.model_cache[result["model_id"]]
+        assert result["model_info"] is model_data["model_info_dict"]
+        assert result["topology_result"] is model_data["topology_result_dict"]
+        assert model_data["model_info_dict"] == model_data["model_info"].model_dump()
+
+    def test_loaded_model_data_is_read_only(self):
+        """测试节点拿到的模型数据是只读视图，不能修改缓存"""
+        result = self.agent.process_upload(
+            file_content=b"test content",
+            filename="test.stl",
+            file_format="stl"
+        )
+        request = AnalysisRequest(
+            model_id=result["model_id"],
+            natural_language_query="测量体积",
+            state_id=self.agent.current_state_id
+        )
+
+        mesh_data = self.agent._load_model({"request": request})["mesh_data"]
+
+        assert mesh_data is self.agent.model_cache[result["model_id"]]
+        with pytest.raises(TypeError):
+            mesh_data["file_path"] = "/tmp/other.stl"
+        with pytest.raises(TypeError):
+            self.agent.model_cache[result["model_id"]]["mesh"] = None
 
     def test_get_model_info(self):
         """测试获取模型信息"""
@@ -390,6 +784,82 @@ class TestLLMNLMeshAgent:
                 mock_remove.assert_called_once_with("/uploads/test.stl")
                 assert "test-model" not in self.agent.model_cache
 
+    def test_model_cache_evicts_least_recently_used(self):
+        """测试模型缓存超出容量时淘汰最久未使用的模型并删除其文件"""
+        with patch.object(LLMNLMeshAgent, "model_cache_maxsize", 2):
+            agent = LLMNLMeshAgent()
+        first = agent.process_upload(b"a", "a.stl", "stl")["model_id"]
+        second = agent.process_upload(b"b", "b.stl", "stl")["model_id"]
+        agent.get_model_info(first)  # 刷新为最近使用
+
+        with patch('os.path.exists', return_value=True), patch('os.remove') as mock_remove:
+            third = agent.process_upload(b"c", "c.stl", "stl")["model_id"]
+
+        mock_remove.assert_called_once_with("/uploads/b.stl")
+        assert second not in agent.model_cache
+        assert first in agent.model_cache and third in agent.model_cache
+
+    def test_model_cache_expires_idle_models(self):
+        """测试注册超过过期时间的模型被移除并调用淘汰回调"""
+        clock = Mock(return_value=0.0)
+        evicted = []
+        cache = ModelCache(maxsize=4, ttl=10.0, on_evict=lambda k, v: evicted.append(k), timer=clock)
+        cache["a"] = {"file_path": "/uploads/a.stl"}
+
+        clock.return_value = 9.0
+        assert cache.get("a") is not None
+
+        clock.return_value = 10.0
+        assert cache.get("a") is None
+        assert "a" not in cache
+        assert evicted == ["a"]
+
+    def test_state_rotation_without_uuid(self):
+        """测试上传和清理生成新的唯一状态ID，且不调用uuid4生成状态ID"""
+        seen = {self.agent.current_state_id}
+
+        with patch('nl_mesh_inspect.llm_agent.uuid.uuid4', wraps=uuid.uuid4) as mock_uuid:
+            result = self.agent.process_upload(b"test content", "test.stl", "stl")
+            seen.add(self.agent.current_state_id)
+            with patch('os.path.exists', return_value=False):
+                self.agent.cleanup_model(result["model_id"])
+            seen.add(self.agent.current_state_id)
+
+        # 只有模型ID使用uuid4
+        assert mock_uuid.call_count == 1
+        assert len(seen) == 3
+        assert result["state_id"] in seen
+
+    def _request_for(self, model_id: str, state_id: str) -> AnalysisRequest:
+        return AnalysisRequest(model_id=model_id, natural_language_query="测量体积", state_id=state_id)
+
+    def test_other_model_upload_keeps_request_valid(self):
+        """测试上传其他模型后，针对已有模型的请求仍然有效"""
+        stale_state = self.agent.current_state_id
+        first = self.agent.process_upload(b"a", "a.stl", "stl")
+        second = self.agent.process_upload(b"b", "b.stl", "stl")
+
+        # 模型注册时的状态和之后签发的状态都有效
+        for state_id in (first["state_id"], second["state_id"]):
+            request = self._request_for(first["model_id"], state_id)
+            assert self.agent._validate_input({"request": request}) == {}
+
+        # 模型注册之前的状态已过期
+        result_state = self.agent._validate_input(
+            {"request": self._request_for(first["model_id"], stale_state)}
+        )
+        assert "状态ID不匹配" in result_state["error"]
+
+    def test_foreign_state_id_rejected_for_registered_model(self):
+        """测试非本进程签发的状态ID被拒绝"""
+        uploaded = self.agent.process_upload(b"a", "a.stl", "stl")
+
+        result_state = self.agent._validate_input(
+            {"request": self._request_for(uploaded["model_id"], "foreign-999999")}
+        )
+
+        assert "状态ID不匹配" in result_state["error"]
+
     def test_get_system_prompt(self):
         """测试获取系统提示词"""
         prompt = self.agent.get_system_prompt()
@@ -400,4 +870,23 @@ class TestLLMNLMeshAgent:
         """测试获取当前状态"""
         state_id = self.agent.get_current_state()
         assert isinstance(state_id, str)
-        assert state_id == self.agent.current_state_id
\ No newline at end of file
+        assert state_id == self.agent.current_state_id
+
+    def test_import_defers_heavy_dependencies(self):
+        """测试导入智能体模块时不加载LangGraph和langchain_openai"""
+        script = textwrap.dedent("""
+            import sys
+            import nl_mesh_inspect.llm_agent
+
+            loaded = [name for name in ("langgraph", "langchain_openai") if name in sys.modules]
+            assert not loaded, loaded
+        """)
+
+        completed = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            timeout=120
+        )
+
+        assert completed.returncode == 0, completed.stderr.decode()
@@ -0,0 +1,70 @@
+"""
+LLM响应缓存测试
+"""
+
+from nl_mesh_inspect.llm_cache import LLMCache
+
+
+class TestLLMCache:
+    """LLM响应缓存测试"""
+
+    def setup_method(self):
+        self.cache = LLMCache(maxsize=2)
+        self.messages = [
+            {"role": "system", "content": "系统提示"},
+            {"role": "user", "content": "测量体积"}
+        ]
+
+    def test_cache_key_is_deterministic(self):
+        """测试相同输入生成相同的缓存键，工具顺序不影响结果"""
+        first = LLMCache.cache_key("model", self.messages, ["B", "A"])
+        second = LLMCache.cache_key("model", list(self.messages), ["A", "B"])
+
+        assert first == second
+        assert first != LLMCache.cache_key("other-model", self.messages, ["A", "B"])
+        assert first != LLMCache.cache_key("model", self.messages[:1], ["A", "B"])
+
+    def test_cache_key_distinguishes_message_roles(self):
+        """测试LangChain消息对象按角色和内容生成缓存键"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        system = LLMCache.cache_key("model", [SystemMessage(content="测量体积")], [])
+        human = LLMCache.cache_key("model", [HumanMessage(content="测量体积")], [])
+
+        assert system != human
+        assert human == LLMCache.cache_key("model", [HumanMessage(content="测量体积")], [])
+
+    def test_cache_key_skips_sampling(self):
+        """测试temperature大于0时不缓存"""
+        assert LLMCache.cache_key("model", self.messages, [], temperature=0.7) is None
+        assert LLMCache.cache_key("model", self.messages, [], temperature=0) is not None
+
+    def test_get_and_set_track_stats(self):
+        """测试读写缓存并统计命中"""
+        assert self.cache.get("k") is None
+
+        self.cache.set("k", {"content": "响应", "tool_calls": []})
+
+        assert self.cache.get("k") == {"content": "响应", "tool_calls": []}
+        assert self.cache.stats == {"hits": 1, "misses": 1}
+
+    def test_evicts_least_recently_used(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        self.cache.set("a", {"content": "a"})
+        self.cache.set("b", {"content": "b"})
+        self.cache.get("a")
+        self.cache.set("c", {"content": "c"})
+
+        assert self.cache.get("b") is None
+        assert self.cache.get("a") is not None
+        assert len(self.cache) == 2
+
+    def test_clear(self):
+        """测试清空缓存和统计"""
+        self.cache.set("a", {"content": "a"})
+        self.cache.get("a")
+
+        self.cache.clear()
+
+        assert len(self.cache) == 0
+        assert self.cache.stats == {"hits": 0, "misses": 0}
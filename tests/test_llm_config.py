@@ -0,0 +1,82 @@
+"""
+大模型配置与工具执行测试
+"""
+
+import pytest
+from unittest.mock import patch
+
+from nl_mesh_inspect.llm_config import (
+    MESH_ANALYSIS_TOOLS, TOOL_DISPATCH, TOOL_NAMES, create_llm_with_tools, execute_tool,
+    get_tool_schemas
+)
+
+
+class TestExecuteTool:
+    """工具执行测试"""
+
+    def setup_method(self):
+        self.mesh_data = {"mesh": {"vertices": 100, "faces": 200}}
+
+    def test_dispatch_covers_all_tools(self):
+        """测试调度表包含所有绑定的工具"""
+        assert set(TOOL_DISPATCH) == {tool.__name__ for tool in MESH_ANALYSIS_TOOLS}
+
+    @pytest.mark.parametrize("tool_class", MESH_ANALYSIS_TOOLS)
+    def test_dispatch_matches_tool_methods(self, tool_class):
+        """测试调度结果与工具模型方法的结果一致"""
+        tool = tool_class(mesh_data=self.mesh_data)
+        method_name = TOOL_DISPATCH[tool_class.__name__].__name__.lstrip("_")
+
+        assert execute_tool(tool_class.__name__, {}, self.mesh_data) == getattr(tool, method_name)()
+
+    @pytest.mark.parametrize("tool_class", MESH_ANALYSIS_TOOLS)
+    def test_execution_does_not_instantiate_tool_models(self, tool_class):
+        """测试执行工具时不构造（校验）工具模型，工具模型仅作为绑定描述"""
+        with patch.object(tool_class, "__init__", side_effect=AssertionError("不应实例化")):
+            result = execute_tool(tool_class.__name__, {}, self.mesh_data)
+
+        assert "error" not in result
+
+    def test_unknown_tool(self):
+        """测试未知工具返回错误"""
+        assert execute_tool("UnknownTool", {}, self.mesh_data) == {"error": "未知工具: UnknownTool"}
+
+    def test_tool_args_not_modified(self):
+        """测试执行工具不修改调用方的参数字典"""
+        tool_args = {}
+
+        execute_tool("MeasureVolumeTool", tool_args, self.mesh_data)
+
+        assert tool_args == {}
+
+    def test_results_are_independent(self):
+        """测试每次执行返回新的结果对象"""
+        first = execute_tool("DetectHolesTool", {}, self.mesh_data)
+        first["result"]["holes"].clear()
+
+        second = execute_tool("DetectHolesTool", {}, self.mesh_data)
+        assert len(second["result"]["holes"]) == 2
+
+
+class TestToolBinding:
+    """工具绑定测试"""
+
+    def test_tool_names(self):
+        """测试工具名称与工具列表一致"""
+        assert TOOL_NAMES == tuple(tool.__name__ for tool in MESH_ANALYSIS_TOOLS)
+
+    def test_tool_schemas_generated_once(self):
+        """测试工具描述只生成一次"""
+        schemas = get_tool_schemas()
+
+        assert get_tool_schemas() is schemas
+        assert [schema["function"]["name"] for schema in schemas] == list(TOOL_NAMES)
+
+    def test_real_llm_binds_cached_schemas(self):
+        """测试真实模式直接绑定缓存的工具描述"""
+        with patch("langchain_openai.ChatOpenAI") as mock_chat:
+            llm = create_llm_with_tools(use_mock=False)
+
+        mock_chat.return_value.bind.assert_called_once_with(tools=list(get_tool_schemas()))
+        mock_chat.return_value.bind_tools.assert_not_called()
+        assert llm is mock_chat.return_value.bind.return_value
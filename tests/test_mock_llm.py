@@ -0,0 +1,46 @@
+"""
+模拟LLM测试
+"""
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from nl_mesh_inspect.mock_llm import mock_llm
+
+
+def _tool_names(query: str) -> list:
+    response = mock_llm.invoke([SystemMessage(content="系统提示"), HumanMessage(content=query)])
+    return [tool_call["name"] for tool_call in response.tool_calls]
+
+
+class TestMockLLM:
+    """模拟LLM路由测试"""
+
+    @pytest.mark.parametrize("query, expected", [
+        ("请测量体积", ["MeasureVolumeTool"]),
+        ("What is the VOLUME?", ["MeasureVolumeTool"]),
+        ("测量表面积", ["MeasureSurfaceAreaTool"]),
+        ("compute surface area", ["MeasureSurfaceAreaTool"]),
+        ("检测孔洞", ["DetectHolesTool"]),
+        ("find Holes", ["DetectHolesTool"]),
+        ("检查拓扑", ["CheckTopologyTool"]),
+        ("你好", ["MeasureVolumeTool", "CheckTopologyTool"]),
+    ])
+    def test_routes_by_keyword(self, query, expected):
+        """测试按关键词选择工具"""
+        assert _tool_names(query) == expected
+
+    def test_priority_when_multiple_keywords(self):
+        """测试多个关键词同时出现时按优先级选择，与出现位置无关"""
+        assert _tool_names("检查拓扑，然后测量体积") == ["MeasureVolumeTool"]
+        assert _tool_names("topology and surface area") == ["MeasureSurfaceAreaTool"]
+
+    def test_without_user_message(self):
+        """测试没有用户消息时执行综合分析"""
+        response = mock_llm.invoke([SystemMessage(content="测量体积")])
+
+        assert [c["name"] for c in response.tool_calls] == ["MeasureVolumeTool", "CheckTopologyTool"]
+
+    def test_bind_tools_returns_self(self):
+        """测试绑定工具返回自身"""
+        assert mock_llm.bind_tools([]) is mock_llm
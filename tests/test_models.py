@@ -4,11 +4,12 @@
 
 import pytest
 from datetime import datetime
+from pydantic import ValidationError
 
 from nl_mesh_inspect.models import (
     ModelFormat, AnalysisIntent, GeometricEntity,
     ModelUploadRequest, GeometricFeature, TopologyCheckResult,
-    AnalysisRequest, AnalysisResult, ModelInfo, ErrorResponse
+    AnalysisRequest, AnalysisResult, ModelInfo, ErrorResponse, VALID_FORMATS
 )
 
 
@@ -26,6 +27,8 @@ class TestModelFormats:
         """测试模型格式成员"""
         assert "stl" in ModelFormat.__members__.values()
         assert "obj" in ModelFormat.__members__.values()
+        assert "stl" in VALID_FORMATS
+        assert "dwg" not in VALID_FORMATS
 
 
 class TestAnalysisIntent:
@@ -176,6 +179,21 @@ class TestAnalysisRequest:
         assert request.intent == AnalysisIntent.OPERATION
         assert request.parameters["min_diameter"] == 5
 
+    def test_analysis_request_is_immutable(self):
+        """测试分析请求创建后不可修改，需通过副本更新"""
+        request = AnalysisRequest(
+            model_id="test-model-123",
+            natural_language_query="测量体积",
+            state_id="state-123"
+        )
+
+        with pytest.raises(ValidationError):
+            request.model_id = "other-model"
+
+        updated = request.model_copy(update={"model_id": "other-model"})
+        assert updated.model_id == "other-model"
+        assert request.model_id == "test-model-123"
+
 
 class TestAnalysisResult:
     """分析结果测试"""
@@ -235,6 +253,25 @@ class TestModelInfo:
         assert model_info.face_count == 200
         assert len(model_info.bounding_box) == 6
 
+    def test_model_info_is_immutable(self):
+        """测试模型信息创建后不可修改，需通过副本更新"""
+        model_info = ModelInfo(
+            model_id="",
+            file_name="",
+            file_format=ModelFormat.STL,
+            file_size=0,
+            vertex_count=8,
+            face_count=12,
+            bounding_box=[0, 0, 0, 1, 1, 1]
+        )
+
+        with pytest.raises(ValidationError):
+            model_info.model_id = "test-model-123"
+
+        updated = model_info.model_copy(update={"model_id": "test-model-123"})
+        assert updated.model_id == "test-model-123"
+        assert model_info.model_id == ""
+
 
 class TestErrorResponse:
     """错误响应测试"""
@@ -3,9 +3,10 @@
 """
 
 import pytest
+from unittest.mock import Mock, patch
 
 from nl_mesh_inspect.nlp_engine import (
-    EntityExtractor, IntentClassifier, QueryParser
+    EntityExtractor, IntentClassifier, QueryParser, _best_category, _scan_plan
 )
 from nl_mesh_inspect.models import AnalysisIntent, GeometricEntity
 
@@ -35,6 +36,42 @@ class TestEntityExtractor:
         entity_types = [e["type"] for e in entities]
         assert GeometricEntity.EDGE in entity_types
 
+    def test_extract_entities_first_occurrence_order(self):
+        """测试每个关键词只记录首次出现位置，位置相同时按声明顺序排列"""
+        entities = self.extractor.extract_entities("边缘和顶点，再看边缘")
+
+        assert [(e["keyword"], e["position"]) for e in entities] == [
+            ("边", 0), ("边缘", 0), ("顶点", 3), ("点", 4)
+        ]
+
+    def test_extract_entities_without_automaton(self):
+        """测试未安装pyahocorasick时前缀树匹配的结果一致"""
+        text = "Select the PLANE faces and holes near each Vertex"
+        expected = self.extractor.extract_entities(text)
+
+        with patch("nl_mesh_inspect.nlp_engine.ahocorasick", None):
+            extractor = EntityExtractor()
+
+        assert extractor._automaton is None
+        assert extractor.extract_entities(text) == expected
+
+    def test_extract_entities_with_automaton(self):
+        """测试Aho-Corasick自动机与前缀树匹配的结果一致"""
+        pytest.importorskip("ahocorasick")
+        with patch("nl_mesh_inspect.nlp_engine.ahocorasick", None):
+            fallback = EntityExtractor()
+
+        for text in ["选择所有直径大于10mm的孔洞", "高亮所有平面表面", "Check the vertices and edges"]:
+            assert self.extractor.extract_entities(text) == fallback.extract_entities(text)
+
+    def test_keyword_tables_shared_between_instances(self):
+        """测试关键词前缀树在模块加载时构建，实例化时不重复构建"""
+        with patch("nl_mesh_inspect.nlp_engine._build_keyword_trie") as mock_build:
+            extractor = EntityExtractor()
+
+        mock_build.assert_not_called()
+        assert extractor._keyword_trie is self.extractor._keyword_trie
+
     def test_extract_numerical_constraints(self):
         """测试数值约束提取"""
         text = "选择直径大于10mm的孔洞"
@@ -47,6 +84,16 @@ class TestEntityExtractor:
             assert "match" in constraint
             assert "groups" in constraint
 
+    def test_numerical_constraints_tagged_with_kind(self):
+        """测试数值约束按出现顺序单次提取并带有类别标签"""
+        constraints = self.extractor.extract_numerical_constraints("直径在5到10mm之间，大于2cm，长度30mm")
+
+        assert [(c["kind"], c["match"], c["groups"]) for c in constraints] == [
+            ("range", "5到10mm", ("5", "10", "mm")),
+            ("gt", "大于2cm", ("大于", "2", "cm")),
+            ("value", "30mm", ("30", "mm"))
+        ]
+
     def test_normalize_units(self):
         """测试单位标准化"""
         # 毫米到毫米
@@ -60,6 +107,12 @@ class TestEntityExtractor:
         # 默认单位
         assert self.extractor.normalize_units(10, "unknown") == 10
 
+    def test_normalize_units_case_insensitive(self):
+        """测试单位不区分大小写，缺省单位按毫米处理"""
+        assert self.extractor.normalize_units(1, "CM") == 10
+        assert self.extractor.normalize_units(2, "Inch") == pytest.approx(50.8)
+        assert self.extractor.normalize_units(10, None) == 10
+
 
 class TestIntentClassifier:
     """意图分类器测试"""
@@ -91,6 +144,26 @@ class TestIntentClassifier:
         intent = self.classifier.classify_intent(text)
         assert intent == AnalysisIntent.QUERY
 
+    def test_classification_stops_once_winner_is_decided(self):
+        """测试领先者确定后不再匹配剩余类别的模式"""
+        hit = Mock(**{"search.return_value": True})
+        miss = Mock(**{"search.return_value": False})
+        later = Mock()
+        plan = _scan_plan(["a", "b", "c"], {"a": [hit, hit], "b": [later, later], "c": [later]})
+
+        assert _best_category("text", plan) == ("a", 2)
+        later.search.assert_not_called()
+
+        # 领先者尚未确定时继续匹配，平局取靠前的类别
+        plan = _scan_plan(["a", "b"], {"a": [hit, miss], "b": [hit, miss]})
+        assert _best_category("text", plan) == ("a", 1)
+
+    def test_intent_score_counts_patterns_not_matches(self):
+        """测试意图得分按命中的模式数计算，同一模式重复出现只计一次"""
+        text = "高亮高亮高亮 体积 volume"
+        intent = self.classifier.classify_intent(text)
+        assert intent == AnalysisIntent.QUERY
+
 
 class TestQueryParser:
     """查询解析器测试"""
@@ -116,6 +189,34 @@ class TestQueryParser:
         assert len(result["entities"]) > 0
         assert "min_value" in result["parameters"]
 
+    @pytest.mark.parametrize("query, parameters", [
+        ("直径大于5mm", {"min_value": 5.0}),
+        ("直径不小于2cm", {"min_value": 20.0}),
+        ("直径小于3cm", {"max_value": 30.0}),
+        ("半径不大于 4 米", {"max_value": 4000.0}),
+        ("直径等于5mm", {"target_value": 5.0}),
+        ("长度在1到2米之间", {"min_value": 1000.0, "max_value": 2000.0}),
+        ("diameter > 5mm", {"min_value": 5.0}),
+        ("diameter >= 2 cm", {"min_value": 20.0}),
+        ("radius <= 3mm", {"max_value": 3.0}),
+        ("length 5-10mm", {"min_value": 5.0, "max_value": 10.0}),
+        ("选择直径5-10CM的孔", {"min_value": 50.0, "max_value": 100.0}),
+        ("直径大于5MM", {"min_value": 5.0}),
+        ("diameter < 2 Cm", {"max_value": 20.0}),
+    ])
+    def test_parse_constraint_kinds(self, query, parameters):
+        """测试各类数值约束解析为对应的参数"""
+        assert self.parser.parse_query(query)["parameters"] == parameters
+
+    @pytest.mark.parametrize("query", [
+        "version 1.2-3.4.5 体积",
+        "2024-10-15 测量体积",
+        "直径大于3.4.5mm",
+    ])
+    def test_parse_malformed_numbers_ignored(self, query):
+        """测试畸形数字和日期不被解析为数值约束"""
+        assert self.parser.parse_query(query)["parameters"] == {}
+
     def test_parse_topology_check_query(self):
         """测试拓扑检查查询解析"""
         query = "检查模型是否有自相交面"
@@ -158,4 +259,130 @@ class TestQueryParser:
         assert result["is_valid"] is True
         assert len(result["entities"]) >= 1  # 至少检测到圆柱面
         # 检查参数（可能解析为范围或目标值）
-        assert len(result["parameters"]) > 0
\ No newline at end of file
+        assert len(result["parameters"]) > 0
+
+    def test_parse_batch_matches_parse_query(self):
+        """测试批量解析结果与逐条解析一致且保持顺序"""
+        queries = ["测量这个模型的体积", "选择所有直径大于10mm的孔洞", "测量这个模型的体积"]
+
+        results = self.parser.parse_batch(queries)
+
+        assert results == [self.parser.parse_query(q) for q in queries]
+
+    def test_parse_batch_duplicates_are_independent(self):
+        """测试重复查询的批量解析结果互不影响"""
+        first, second = self.parser.parse_batch(["测量体积", "测量体积"])
+
+        first["parameters"]["tampered"] = True
+        assert "tampered" not in second["parameters"]
+
+    def test_parse_batch_empty(self):
+        """测试空批量返回空列表"""
+        assert self.parser.parse_batch([]) == []
+
+
+class TestQueryParserCache:
+    """查询解析缓存测试"""
+
+    def setup_method(self):
+        QueryParser.clear_cache()
+        self.parser = QueryParser()
+
+    def teardown_method(self):
+        QueryParser.clear_cache()
+
+    def test_parse_query_cached_matches_uncached(self):
+        """测试缓存解析结果与直接解析一致"""
+        query = "选择所有直径大于5mm的孔洞"
+
+        assert self.parser.parse_query_cached(query) == self.parser.parse_query(query)
+        # 第二次命中缓存
+        assert self.parser.parse_query_cached(query) == self.parser.parse_query(query)
+
+    def test_parse_query_cached_returns_copy(self):
+        """测试缓存命中返回副本，修改不影响缓存"""
+        query = "测量这个模型的体积"
+
+        first = self.parser.parse_query_cached(query)
+        first["parameters"]["tampered"] = True
+        first["entities"].append({"type": "bogus"})
+
+        second = self.parser.parse_query_cached(query)
+        assert "tampered" not in second["parameters"]
+        assert {"type": "bogus"} not in second["entities"]
+
+    def test_parse_query_cached_evicts_oldest(self):
+        """测试缓存超出容量时淘汰最久未使用的条目"""
+        with patch.object(QueryParser, "_parse_cache_maxsize", 2):
+            self.parser.parse_query_cached("测量体积")
+            self.parser.parse_query_cached("检查拓扑")
+            self.parser.parse_query_cached("测量体积")  # 刷新为最近使用
+            self.parser.parse_query_cached("高亮所有平面")
+
+        assert "测量体积" in QueryParser._parse_cache
+        assert "检查拓扑" not in QueryParser._parse_cache
+        assert len(QueryParser._parse_cache) == 2
+
+    def test_cache_info_counts_hits_and_misses(self):
+        """测试缓存统计记录命中和未命中次数"""
+        self.parser.parse_query_cached("测量体积")
+        self.parser.parse_query_cached("测量体积")
+        self.parser.parse_query_cached("检查拓扑")
+
+        assert QueryParser.cache_info() == {
+            "hits": 1, "misses": 2, "maxsize": QueryParser._parse_cache_maxsize, "currsize": 2
+        }
+
+        QueryParser.clear_cache()
+        assert QueryParser.cache_info()["hits"] == 0
+
+
+class _PrefixSemanticCache:
+    """测试用语义缓存：前两个字符相同即视为相似"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, text):
+        return self.entries.get(text[:2])
+
+    def put(self, text, result):
+        self.entries.setdefault(text[:2], result)
+
+
+class TestQueryParserSemanticCache:
+    """查询解析语义缓存测试"""
+
+    def setup_method(self):
+        QueryParser.clear_cache()
+        self.semantic_cache = _PrefixSemanticCache()
+        self.parser = QueryParser(semantic_cache=self.semantic_cache)
+
+    def teardown_method(self):
+        QueryParser.clear_cache()
+
+    def test_similar_query_reuses_parse_result(self):
+        """测试相似查询命中语义缓存，原始文本为当前查询"""
+        self.parser.parse_query_cached("测量体积")
+
+        with patch.object(self.parser, "parse_query") as mock_parse:
+            result = self.parser.parse_query_cached("测量这个模型的体积")
+
+        mock_parse.assert_not_called()
+        assert result["original_text"] == "测量这个模型的体积"
+        assert result["query_type"] == self.parser.parse_query("测量体积")["query_type"]
+        # 近似结果不写入共享的精确缓存
+        assert "测量这个模型的体积" not in QueryParser._parse_cache
+
+    def test_queries_with_numbers_skip_semantic_cache(self):
+        """测试含数字的查询既不查找也不写入语义缓存"""
+        self.parser.parse_query_cached("选择直径大于5mm的孔洞")
+        assert self.semantic_cache.entries == {}
+
+        self.semantic_cache.put("选择", {"bogus": True})
+        result = self.parser.parse_query_cached("选择直径大于50mm的孔洞")
+        assert result["parameters"] == {"min_value": 50.0}
+
+    def test_semantic_cache_disabled_by_default(self):
+        """测试默认不启用语义缓存"""
+        assert QueryParser().semantic_cache is None
@@ -0,0 +1,351 @@
+"""
+几何分析工具测试
+"""
+
+import io
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+from unittest.mock import Mock, patch
+
+import numpy as np
+import trimesh
+
+from nl_mesh_inspect import tools
+from nl_mesh_inspect.models import GeometricEntity, ModelFormat
+from nl_mesh_inspect.tools import GeometryAnalyzer
+
+
+class TestGeometryAnalyzerMeasurements:
+    """几何测量测试"""
+
+    def setup_method(self):
+        self.analyzer = GeometryAnalyzer()
+
+    def test_measure_box(self):
+        """测试长方体的体积和表面积"""
+        mesh = trimesh.creation.box(extents=[1.0, 2.0, 3.0])
+
+        assert self.analyzer.measure_volume(mesh) == pytest.approx(6.0)
+        assert self.analyzer.measure_surface_area(mesh) == pytest.approx(22.0)
+
+    def test_measure_matches_trimesh(self):
+        """测试测量结果与trimesh一致"""
+        mesh = trimesh.creation.icosphere(subdivisions=3, radius=2.0)
+
+        assert self.analyzer.measure_volume(mesh) == pytest.approx(mesh.volume)
+        assert self.analyzer.measure_surface_area(mesh) == pytest.approx(mesh.area)
+
+    def test_measure_without_numba(self):
+        """测试未安装numba时回退到trimesh实现"""
+        mesh = trimesh.creation.box(extents=[1.0, 2.0, 3.0])
+
+        with patch.object(tools, "njit", None):
+            assert self.analyzer.measure_volume(mesh) == pytest.approx(6.0)
+            assert self.analyzer.measure_surface_area(mesh) == pytest.approx(22.0)
+
+    def test_measure_distance(self):
+        """测试两点间距离"""
+        assert self.analyzer.measure_distance(None, [0, 0, 0], [1, 2, 2]) == pytest.approx(3.0)
+
+        with pytest.raises(ValueError):
+            self.analyzer.measure_distance(None, [0, 0], [1, 2, 2])
+
+    def test_measure_distances_batch(self):
+        """测试批量距离与逐个测量一致，并支持广播"""
+        points_a = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [3.0, 4.0, 0.0]])
+        points_b = np.array([[1.0, 2.0, 2.0], [1.0, 1.0, 1.0], [0.0, 0.0, 0.0]])
+
+        distances = self.analyzer.measure_distances_batch(points_a, points_b)
+
+        expected = [self.analyzer.measure_distance(None, a, b) for a, b in zip(points_a, points_b)]
+        assert distances == pytest.approx(expected)
+        assert self.analyzer.measure_distances_batch(points_a, [0.0, 0.0, 0.0]) == pytest.approx(
+            [0.0, 3 ** 0.5, 5.0]
+        )
+
+        with pytest.raises(ValueError):
+            self.analyzer.measure_distances_batch(points_a[:, :2], points_b[:, :2])
+
+    def test_measure_invalid_mesh(self):
+        """测试无效网格返回0"""
+        mesh = Mock(spec=[])
+
+        assert self.analyzer.measure_volume(mesh) == 0.0
+        assert self.analyzer.measure_surface_area(mesh) == 0.0
+
+    def test_measure_volume_and_area_matches_separate(self):
+        """测试单次遍历的体积和表面积与分别测量一致"""
+        mesh = trimesh.creation.icosphere(subdivisions=3, radius=2.0)
+
+        volume, area = self.analyzer.measure_volume_and_area(mesh)
+
+        assert volume == pytest.approx(self.analyzer.measure_volume(mesh))
+        assert area == pytest.approx(self.analyzer.measure_surface_area(mesh))
+
+    def test_measure_volume_and_area_without_numba(self):
+        """测试未安装numba时同时测量回退到trimesh实现"""
+        mesh = trimesh.creation.box(extents=[1.0, 2.0, 3.0])
+
+        with patch.object(tools, "njit", None):
+            volume, area = self.analyzer.measure_volume_and_area(mesh)
+
+        assert volume == pytest.approx(6.0)
+        assert area == pytest.approx(22.0)
+
+    def test_measure_volume_and_area_invalid_mesh(self):
+        """测试无效网格同时测量返回0"""
+        assert self.analyzer.measure_volume_and_area(Mock(spec=[])) == (0.0, 0.0)
+
+    def test_kernel_arrays_use_float32(self):
+        """测试内核数组为连续内存的float32顶点和int32面片"""
+        mesh = trimesh.creation.icosphere(subdivisions=2)
+
+        vertices, faces = tools.mesh_kernel_arrays(mesh)
+
+        assert vertices.dtype == np.float32 and faces.dtype == np.int32
+        assert vertices.flags["C_CONTIGUOUS"] and faces.flags["C_CONTIGUOUS"]
+
+    def test_kernel_arrays_keep_float64_for_large_coordinates(self):
+        """测试平移到中心后坐标仍超出float32精度范围时保留float64"""
+        mesh = trimesh.creation.box(extents=[4e6, 2.0, 3.0])
+
+        vertices, _ = tools.mesh_kernel_arrays(mesh)
+
+        assert vertices.dtype == np.float64
+        assert self.analyzer.measure_volume(mesh) == pytest.approx(24e6)
+
+    @pytest.mark.parametrize("offset", [1e4, 1e5, 2e6])
+    def test_measure_translated_mesh_keeps_precision(self, offset):
+        """测试远离原点的小模型的体积和面积不受float32精度影响"""
+        mesh = trimesh.creation.box(extents=[1.0, 1.0, 1.0])
+        mesh.apply_translation([offset, offset, offset])
+
+        vertices, _ = tools.mesh_kernel_arrays(mesh)
+        volume, area = self.analyzer.measure_volume_and_area(mesh)
+
+        assert vertices.dtype == np.float32
+        assert volume == pytest.approx(1.0, rel=1e-6)
+        assert area == pytest.approx(6.0, rel=1e-6)
+        assert self.analyzer.measure_volume(mesh) == pytest.approx(1.0, rel=1e-6)
+        assert self.analyzer.measure_surface_area(mesh) == pytest.approx(6.0, rel=1e-6)
+
+    def test_measure_with_precomputed_arrays(self):
+        """测试使用预先计算的内核数组进行测量"""
+        mesh = trimesh.creation.box(extents=[1.0, 2.0, 3.0])
+        arrays = tools.mesh_kernel_arrays(mesh)
+
+        with patch.object(tools, "mesh_kernel_arrays") as mock_arrays:
+            volume, area = self.analyzer.measure_volume_and_area(mesh, arrays)
+
+        mock_arrays.assert_not_called()
+        assert volume == pytest.approx(6.0)
+        assert area == pytest.approx(22.0)
+
+    def test_warmup_kernels(self):
+        """测试内核预热不报错"""
+        tools.warmup_kernels()
+
+    def test_measure_from_worker_thread_exits_cleanly(self):
+        """测试在工作线程中首次调用内核后进程能正常退出"""
+        script = textwrap.dedent("""
+            import threading
+            import trimesh
+            from nl_mesh_inspect.tools import GeometryAnalyzer
+
+            mesh = trimesh.creation.icosphere(subdivisions=2)
+            results = []
+            thread = threading.Thread(
+                target=lambda: results.append(GeometryAnalyzer().measure_volume(mesh))
+            )
+            thread.start()
+            thread.join()
+            assert results and results[0] > 0
+        """)
+
+        completed = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            timeout=120
+        )
+
+        assert completed.returncode == 0, completed.stderr.decode()
+
+
+class TestTopologyCheck:
+    """拓扑检查测试"""
+
+    def setup_method(self):
+        self.analyzer = GeometryAnalyzer()
+
+    def test_quick_check_skips_self_intersection(self):
+        """测试默认检查只计算一次水密性，不进行自相交检查"""
+        mesh = Mock(is_watertight=True)
+        type(mesh).self_intersecting = property(Mock(side_effect=AssertionError("不应检查自相交")))
+
+        result = self.analyzer.check_topology(mesh)
+
+        assert result.is_watertight is True
+        assert result.is_manifold is True
+        assert result.has_self_intersections is False
+        assert result.issues == []
+
+    def test_detailed_check_includes_self_intersection(self):
+        """测试完整检查包括自相交检查"""
+        mesh = Mock(is_watertight=False, self_intersecting=True)
+
+        result = self.analyzer.check_topology(mesh, detailed=True)
+
+        assert result.has_self_intersections is True
+        assert result.issues == ["模型不是流形", "模型存在自相交面", "模型不是水密的"]
+
+    def test_box_is_watertight(self):
+        """测试长方体网格是水密的"""
+        result = self.analyzer.check_topology(trimesh.creation.box())
+
+        assert result.is_watertight is True
+        assert result.issues == []
+
+
+class TestPlanarFaceDetection:
+    """平面特征检测测试"""
+
+    def setup_method(self):
+        self.analyzer = GeometryAnalyzer()
+
+    def test_box_has_six_planes(self):
+        """测试长方体检测出六个平面，面积与各面一致"""
+        mesh = trimesh.creation.box(extents=[1.0, 2.0, 3.0])
+
+        planes = self.analyzer._detect_planar_faces(mesh)
+
+        assert len(planes) == 6
+        assert all(plane.entity_type == GeometricEntity.PLANE for plane in planes)
+        assert sorted(plane.properties["area"] for plane in planes) == pytest.approx(
+            [2.0, 2.0, 3.0, 3.0, 6.0, 6.0]
+        )
+        assert sorted(i for plane in planes for i in plane.indices) == list(range(len(mesh.faces)))
+
+    def test_plane_bounding_box(self):
+        """测试平面特征的边界框只覆盖该平面"""
+        mesh = trimesh.creation.box(extents=[2.0, 2.0, 2.0])
+
+        top = next(
+            plane for plane in self.analyzer._detect_planar_faces(mesh)
+            if plane.properties["normal"] == pytest.approx([0.0, 0.0, 1.0])
+        )
+
+        assert top.bounding_box == pytest.approx([-1.0, -1.0, 1.0, 1.0, 1.0, 1.0])
+
+    def test_curved_surface_has_no_planes(self):
+        """测试球面不产生平面特征"""
+        mesh = trimesh.creation.icosphere(subdivisions=2)
+
+        assert self.analyzer._detect_planar_faces(mesh) == []
+
+    def test_invalid_mesh_returns_empty(self):
+        """测试无效网格返回空列表"""
+        assert self.analyzer._detect_planar_faces(Mock(spec=[])) == []
+
+
+class TestModelLoader:
+    """模型加载器测试"""
+
+    def setup_method(self):
+        self.loader = tools.ModelLoader()
+        self.mesh = trimesh.creation.box(extents=[1.0, 2.0, 3.0])
+
+    def _export(self, tmp_path, name: str, file_type: str) -> str:
+        file_path = tmp_path / name
+        self.mesh.export(str(file_path), file_type=file_type)
+        return str(file_path)
+
+    @pytest.mark.parametrize("name, file_type, expected_format", [
+        ("model.stl", "stl", ModelFormat.STL),
+        ("model.stl", "stl_ascii", ModelFormat.STL),
+        ("model.ply", "ply", ModelFormat.PLY),
+    ])
+    def test_validate_loads_declared_format(self, tmp_path, name, file_type, expected_format):
+        """测试按声明的格式完整加载文件进行验证"""
+        file_path = self._export(tmp_path, name, file_type)
+
+        with patch.object(self.loader, "load_model", wraps=self.loader.load_model) as mock_load:
+            assert self.loader.validate_file_format(file_path, expected_format) is True
+
+        mock_load.assert_called_once_with(file_path, expected_format)
+
+    def test_validate_binary_stl_with_solid_header(self, tmp_path):
+        """测试文件头以solid开头的二进制STL验证通过"""
+        file_path = tmp_path / "model.stl"
+        file_path.write_bytes(b"solid".ljust(80, b" ") + (1).to_bytes(4, "little") + bytes(50))
+
+        assert self.loader.validate_file_format(str(file_path), ModelFormat.STL) is True
+
+    def test_validate_rejects_invalid_files(self, tmp_path):
+        """测试错误的扩展名或文件内容验证失败"""
+        garbage = tmp_path / "model.stl"
+        garbage.write_bytes(b"not a mesh file")
+
+        assert self.loader.validate_file_format(str(garbage), ModelFormat.STL) is False
+        assert self.loader.validate_file_format(str(garbage), ModelFormat.OBJ) is False
+        assert self.loader.validate_file_format(str(tmp_path / "missing.stl"), ModelFormat.STL) is False
+
+    def test_get_model_info(self):
+        """测试模型信息的边界框和计数"""
+        info = self.loader.get_model_info(self.mesh)
+
+        assert info.bounding_box == [-0.5, -1.0, -1.5, 0.5, 1.0, 1.5]
+        assert all(type(value) is float for value in info.bounding_box)
+        assert info.extents == [1.0, 2.0, 3.0]
+        assert info.signature == self.loader.get_model_info(self.mesh.copy()).signature
+        assert info.signature != self.loader.get_model_info(trimesh.creation.box()).signature
+        assert (info.vertex_count, info.face_count) == (8, 12)
+
+    def test_load_model_passes_file_type(self, tmp_path):
+        """测试加载时直接指定文件类型"""
+        file_path = self._export(tmp_path, "model.stl", "stl")
+
+        with patch.object(tools.trimesh, "load_mesh", wraps=tools.trimesh.load_mesh) as mock_load:
+            mesh = self.loader.load_model(file_path, ModelFormat.STL)
+
+        mock_load.assert_called_once_with(file_path, file_type="stl")
+        assert len(mesh.faces) == len(self.mesh.faces)
+
+
+class TestSaveUploadedFile:
+    """上传文件保存测试"""
+
+    def test_save_bytes_and_file_object(self, tmp_path):
+        """测试字节串和文件对象均可保存，且内容一致"""
+        processor = tools.ModelProcessor(upload_dir=str(tmp_path))
+        content = os.urandom(3 * 1024 + 7)
+
+        from_bytes = processor.save_uploaded_file(content, "a.stl")
+        with patch.object(tools.ModelProcessor, "copy_chunk_size", 1024):
+            from_stream = processor.save_uploaded_file(io.BytesIO(content), "b.stl")
+
+        assert Path(from_bytes).read_bytes() == content
+        assert Path(from_stream).read_bytes() == content
+
+
+class TestModelProcessorProcess:
+    """模型处理测试"""
+
+    def setup_method(self):
+        self.processor = tools.ModelProcessor()
+
+    def test_process_model_returns_topology_and_features(self, tmp_path):
+        """测试处理模型返回网格、内核数组、拓扑检查结果和几何特征"""
+        file_path = tmp_path / "box.stl"
+        trimesh.creation.box(extents=[1.0, 2.0, 3.0]).export(str(file_path))
+
+        result = self.processor.process_model(str(file_path), ModelFormat.STL)
+
+        assert set(result) == {"mesh", "kernel_arrays", "model_info", "topology_result", "features"}
+        assert result["topology_result"].is_watertight is True
+        assert len(result["features"]) == 6